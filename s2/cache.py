@@ -0,0 +1,64 @@
+"""Cache for artifacts derived from map images.
+
+Artifacts are stored in the `cache.path` directory. Their names contain a
+hash of the source file's content and of the parameters used to compute
+them, so changing the map or a parameter computes them again instead of
+using stale data.
+"""
+
+import functools
+import hashlib
+import logging
+import os
+import pathlib
+
+import numpy
+
+from s2.config import get_config
+
+logger = logging.getLogger(__name__)
+
+
+@functools.lru_cache
+def _content_hash(path, mtime, size):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def content_hash(path):
+    """Hash of the file's content, only read again when the file changes."""
+    st = os.stat(path)
+    return _content_hash(str(path), st.st_mtime_ns, st.st_size)
+
+
+def artifact_path(kind, source, params, suffix=".npy"):
+    """Path of the artifact `kind` computed from `source` with `params`."""
+    source = pathlib.Path(source)
+    h = hashlib.sha256()
+    h.update(content_hash(source).encode())
+    h.update(kind.encode())
+    h.update(repr(sorted(params.items())).encode())
+    d = pathlib.Path(get_config("cache", "path"))
+    return d / f"{source.stem}.{kind}.{h.hexdigest()[:16]}{suffix}"
+
+
+def cached_array(kind, source, params, compute):
+    """Load the array `kind` memory mapped, `compute()` it if not cached."""
+    p = artifact_path(kind, source, params)
+    try:
+        return numpy.load(p, mmap_mode="r")
+    except FileNotFoundError:
+        pass
+
+    logger.info("Computing %s of %s, %r", kind, source, params)
+    a = compute()
+    p.parent.mkdir(parents=True, exist_ok=True)
+    tmp = p.with_name(p.name + ".tmp")
+    with open(tmp, "wb") as f:
+        numpy.save(f, a)
+    os.replace(tmp, p)
+    logger.debug("Saved %s to %s", kind, p)
+    return numpy.load(p, mmap_mode="r")
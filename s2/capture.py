@@ -0,0 +1,244 @@
+"""Backends that capture screen areas or replay recorded frames.
+
+Select one with `get_image.backend`. Backends that convert pixels themselves
+write into a few preallocated buffers which they reuse round robin, so an
+image is only valid until the backend captured `BUFFERS` more.
+
+Compare the backends with
+
+    python -m s2.capture pil mss --area 0,0,1920,1080
+"""
+
+import argparse
+import itertools
+import logging
+import pathlib
+import sys
+import time
+
+import cv2
+import numpy
+import PIL.Image
+import PIL.ImageGrab
+
+from s2.util import IMG
+
+logger = logging.getLogger(__name__)
+
+BUFFERS = 8  # enough for the frames in flight in the pipeline
+
+
+class _Buffers:
+    """Round robin of preallocated arrays, one per shape.
+
+    Capturing the minimap and then the map alternates between two shapes,
+    each keeps its own arrays. Only the last `shapes` shapes are kept.
+    """
+
+    def __init__(self, n=BUFFERS, shapes=4):
+        self.n = n
+        self.shapes = shapes
+        self._buffers = {}  # shape: cycle of arrays, least recently used first
+
+    def next(self, shape):
+        buffers = self._buffers.pop(shape, None)
+        if buffers is None:
+            buffers = itertools.cycle(
+                [numpy.empty(shape, numpy.uint8) for _ in range(self.n)]
+            )
+            if len(self._buffers) >= self.shapes:
+                del self._buffers[next(iter(self._buffers))]
+        self._buffers[shape] = buffers
+        return next(buffers)
+
+
+class PILBackend:
+    """`PIL.ImageGrab`, allocates a new image for every capture."""
+
+    screen = True
+
+    def grab(self, box, same_frame=False):
+        return IMG.from_image(PIL.ImageGrab.grab(box, all_screens=True))
+
+    def time(self):
+        """When the last frame was taken, screens are grabbed when asked."""
+        return time.monotonic()
+
+    def close(self):
+        pass
+
+
+class MSSBackend:
+    """`mss`, uses shared memory where the platform supports it."""
+
+    screen = True
+
+    def __init__(self):
+        import mss
+
+        self.sct = mss.mss()
+        self.buffers = _Buffers()
+
+    def grab(self, box, same_frame=False):
+        if box is None:
+            monitor = self.sct.monitors[0]  # all screens, like PILBackend
+        else:
+            left, top, right, bottom = box
+            monitor = dict(left=left, top=top, width=right - left, height=bottom - top)
+        shot = self.sct.grab(monitor)
+        bgra = numpy.frombuffer(shot.raw, numpy.uint8).reshape(
+            shot.height, shot.width, 4
+        )
+        rgb = self.buffers.next((shot.height, shot.width, 3))
+        cv2.cvtColor(bgra, cv2.COLOR_BGRA2RGB, dst=rgb)
+        return IMG.from_rgb(rgb)
+
+    def time(self):
+        return time.monotonic()
+
+    def close(self):
+        self.sct.close()
+
+
+class ReplayFinished(Exception):
+    """Raised when a replay has no more frames."""
+
+
+class ReplayBackend:
+    """Frames from image files, a directory of them or a video.
+
+    `box` is relative to the frame. With `speed="recorded"`, frames are
+    delivered at the video's frame rate, or `fps` for images, otherwise as
+    fast as they are requested. Raises `ReplayFinished` after the last frame.
+    `time` is when the frame was recorded at that rate, whatever the speed,
+    so replays do not depend on how fast they run.
+    """
+
+    screen = False
+
+    def __init__(self, source, speed="max", fps=30):
+        if speed not in ("max", "recorded"):
+            raise ValueError("Expecting speed 'max' or 'recorded'", speed)
+        self.buffers = _Buffers()
+        self.frame = None
+        self.index = -1
+        self.speed = speed
+        self.fps = fps
+        self._start = None
+        if isinstance(source, (list, tuple)):
+            self._frames = iter(source)
+            self.video = None
+        elif pathlib.Path(source).is_dir():
+            self._frames = iter(sorted(p for p in pathlib.Path(source).iterdir()))
+            self.video = None
+        else:
+            self._frames = None
+            self.video = cv2.VideoCapture(str(source))
+            if not self.video.isOpened():
+                raise ValueError("Can not open video", source)
+            self.fps = self.video.get(cv2.CAP_PROP_FPS) or fps
+
+    def _next_frame(self):
+        if self.video is not None:
+            ok, bgr = self.video.read()
+            if not ok:
+                return None
+            rgb = self.buffers.next(bgr.shape)
+            cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB, dst=rgb)
+            return rgb
+        p = next(self._frames, None)
+        if p is None:
+            return None
+        logger.debug("using Debug image %d: %s", self.index + 1, p)
+        with PIL.Image.open(p) as i:
+            return numpy.asarray(i.convert("RGB"))
+
+    def _wait(self):
+        now = time.perf_counter()
+        if self._start is None:
+            self._start = now
+        delay = self._start + self.index / self.fps - now
+        if delay > 0:
+            time.sleep(delay)
+
+    def grab(self, box=None, same_frame=False):
+        if not same_frame or self.frame is None:
+            self.frame = self._next_frame()
+            self.index += 1
+            if self.frame is None:
+                raise ReplayFinished(self.index)
+            if self.speed == "recorded":
+                self._wait()
+        if box:
+            left, top, right, bottom = box
+            return IMG.from_rgb(self.frame[top:bottom, left:right])
+        return IMG.from_rgb(self.frame)
+
+    def time(self):
+        return self.index / self.fps
+
+    def close(self):
+        if self.video is not None:
+            self.video.release()
+
+
+BACKENDS = {
+    "pil": PILBackend,
+    "mss": MSSBackend,
+    "replay": ReplayBackend,
+}
+
+
+def create_backend(name, *args, **kwargs):
+    try:
+        cls = BACKENDS[name]
+    except KeyError:
+        raise ValueError(
+            "Unknown capture backend, expecting one of", name, list(BACKENDS)
+        ) from None
+    return cls(*args, **kwargs)
+
+
+def benchmark(backend, box, seconds):
+    """Frames per second `backend` captures of `box`."""
+    frames = 0
+    start = time.perf_counter()
+    end = start + seconds
+    try:
+        while time.perf_counter() < end:
+            backend.grab(box)
+            frames += 1
+    except ReplayFinished:
+        pass
+    return frames / (time.perf_counter() - start)
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(
+        prog=f"{__package__}.capture", description="Benchmark capture backends"
+    )
+    parser.add_argument("backends", nargs="*", default=["pil", "mss"])
+    parser.add_argument("--area", default="0,0,1920,1080", help="left,top,right,bottom")
+    parser.add_argument("--seconds", type=float, default=3)
+    parser.add_argument("--replay", help="frames or video for the replay backend")
+    options = parser.parse_args(args)
+
+    box = tuple(int(v) for v in options.area.split(","))
+    for name in options.backends:
+        try:
+            backend = create_backend(
+                name, *([options.replay] if name == "replay" else [])
+            )
+            try:
+                fps = benchmark(backend, box, options.seconds)
+            finally:
+                backend.close()
+        except Exception as e:
+            print(f"{name:8} unavailable: {e!r}")
+            continue
+        print(f"{name:8} {fps:8.1f} frames/s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
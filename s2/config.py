@@ -10,13 +10,26 @@ logger = logging.getLogger(__name__)
 DEFAULT_CONFIG = {
     "gui": {
         "map": "map2048x2048",
+        "fps": 60,  # redraws per second at most, updates in between are dropped
+        "motion": {  # of the player between updates
+            "snap": 100,  # pixels of gui.map, larger jumps are not animated
+        },
         "colors": {
             "player": "orange",
         },
+        "tiles": {
+            "size": 256,  # pixels per side
+            "levels": 4,  # levels of detail, each downscaled by 2
+            "level": 0,  # level to start with, the mouse wheel changes it
+            "cache": 64,  # photo images of tiles out of view to keep
+            "margin": 1,  # tiles around the view to draw in advance
+        },
         "poi_files": [
             "pois.toml",
             "screenshots.toml",
         ],
+        "poi_grid": 256,  # cell size in map pixels of the index that finds the POIs in view
+        "poi_margin": 32,  # size of the POI icons
         "enabled_groups": {
             "activities": False,
             "armour": True,
@@ -40,14 +53,81 @@ DEFAULT_CONFIG = {
     "get_image": {
         "title": "GTAIV",
         "size": (1920, 1080),
+        "region": (),  # left, top, right, bottom of the game if not on win32, () for all
+        "backend": "pil",  # or "mss", "replay"
+        "replay": {
+            "source": "",  # video file or directory of frames
+            "speed": "max",  # or "recorded"
+            "fps": 30,  # for directories of frames
+        },
     },
     "source": {
+        "pipeline": True,  # capture, analyze, lookup, match in parallel threads
+        "processes": 0,  # worker processes that analyze frames, 0 for a thread
+        "capture": {  # frames per second to capture
+            "fps": 30,  # while the player stands still, 0 for as fast as possible
+            "max_fps": 60,  # while the player moves at fast_speed
+            "fast_speed": 100.0,  # pixel/s of source.minimap.map
+            "max_idle_interval": 1.0,  # seconds between captures without minimap or map
+        },
         "minimap": {
             "map": "map4096x4096",  # The map to find minimap images in
             "groups": 32,  # round player coordinates to this power of 2 when finding map features
-            "box_size": 256,  # size in pixel to find features in
+            "box_size": 256,  # size in pixel to find features in, while motion is unknown
+            "min_box_size": 160,  # box when the position is well known
+            "max_box_size": 512,
+            "matcher": "bruteforce",  # or "flann_lsh"
+            "two_pass": {  # first match the strongest keypoints to find the area
+                "keypoints": 40,
+                "margin": 16,  # then match all within the minimap's radius plus this
+            },
+            "transform": {  # from minimap to map
+                "model": "affine_partial",  # or "homography", "rigid"
+                "min_matches": 6,  # good matches needed to estimate it
+                "threshold": 2.0,  # RANSAC reprojection error in pixel
+                "max_iterations": 1000,
+                "confidence": 0.999,
+                "scale": 1.0,  # map pixels per minimap pixel, for "rigid"
+            },
+            "phase": {  # follow small motion by phase correlation, without features
+                "enabled": True,
+                "min_response": 0.5,  # of the correlation peak, else match features
+                "max_frames": 10,  # in a row, then match features to avoid drift
+            },
+            "prefetch_lookahead": 1.0,  # seconds to prefetch features ahead, 0 to disable
+            "feature_cache": {  # features of recently visited boxes
+                "entries": 256,
+                "bytes": 64 * 2**20,
+            },
+        },
+        "relocalize": {  # search the whole map when tracking is lost
+            "after": 5,  # frames in a row without an accepted fix
+            "max_wait": 80,  # frames between relocalizations, doubling while they fail
+            "level": 0,  # of the map pyramid, with the scale of the minimap
+            "bin_size": 64,  # keep the strongest features of every bin
+            "per_bin": 8,
+        },
+        "tracker": {
+            "rate": 30,  # updates per second sent to the gui, 0 to send only fixes
+            "timeout": 2.0,  # seconds without a fix until updates stop
+            "filter": {  # in pixels of source.minimap.map
+                "sigma": 4.0,  # error of a position fix with certainty 1
+                "acceleration": 200.0,  # per s²
+                "max_speed": 150.0,  # per s
+                "gate": 3.0,  # reject fixes this many sigmas off
+                "max_rejects": 10,  # accept the next fix after so many rejects
+                "agree": 3,  # accept so many rejected fixes in a row that agree, as a jump
+            },
         },
     },
+    "metrics": {
+        "log_interval": 10.0,  # seconds between latency summaries in the log, 0 to disable
+        "http": "",  # host:port to serve the metrics as JSON, e.g. "127.0.0.1:8765"
+        "dump": "",  # file to write the metrics to on exit
+    },
+    "cache": {
+        "path": "cache",  # directory for edges, feature indexes, ... of the maps
+    },
     "debug": {
         "save_images": {
             "screenshot": False,
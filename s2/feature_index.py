@@ -0,0 +1,245 @@
+"""Precomputed AKAZE features for a whole map.
+
+Detecting features on a crop of the map every time the player enters a new
+cell stalls the update loop. Instead the features of the whole map are
+detected once, sorted into square bins and saved to the cache. A box of the
+map is then served by slicing the bins it covers.
+
+A second, global index holds only the strongest features of every bin. It
+is small enough to match the minimap against the whole map, to find the
+player again after tracking was lost.
+
+Build both indexes with
+
+    python -m s2.feature_index map4096x4096
+"""
+
+import logging
+import math
+import pathlib
+import sys
+import typing
+
+import cv2
+import numpy
+
+from s2.cache import artifact_path
+from s2.config import get_config
+from s2.maps import load_map_edges, map_path
+from s2.util import CANNY_THRESHOLDS
+
+logger = logging.getLogger(__name__)
+
+BIN_SIZE = 64
+
+
+def strongest_per_bin(points, responses, bin_size, per_bin):
+    """Indices of the `per_bin` points with the highest response in each bin."""
+    bins = (points[:, 1] // bin_size).astype(numpy.int64) << 32 | (
+        points[:, 0] // bin_size
+    ).astype(numpy.int64)
+    order = numpy.lexsort((-responses, bins))
+    sorted_bins = bins[order]
+    rank = numpy.arange(len(order)) - numpy.searchsorted(sorted_bins, sorted_bins)
+    return numpy.sort(order[rank < per_bin])
+
+
+class MapFeatures(typing.NamedTuple):
+    """Keypoints of an area of the map.
+
+    `points` are float32 x, y pixel coordinates relative to the area,
+    `descriptors` has one row per point.
+    """
+
+    points: numpy.ndarray
+    descriptors: numpy.ndarray
+
+    @classmethod
+    def from_keypoints(cls, keypoints, descriptors):
+        if descriptors is None:
+            return cls(
+                numpy.empty((0, 2), numpy.float32), numpy.empty((0, 0), numpy.uint8)
+            )
+        return cls(cv2.KeyPoint_convert(keypoints).reshape(-1, 2), descriptors)
+
+
+class FeatureIndex:
+    """Keypoints of a whole image, sorted into square bins.
+
+    Points are sorted by bin, row by row, so all points of the bins
+    `(by, bx0) .. (by, bx1)` are `points[bin_start[by, bx0] : bin_start[by, bx1 + 1]]`.
+    """
+
+    def __init__(self, points, descriptors, bin_start, bin_size):
+        self.points = points
+        self.descriptors = descriptors
+        self.bin_start = bin_start
+        self.bin_size = bin_size
+        self.bins_y = len(bin_start) - 1
+        self.bins_x = bin_start.shape[1] - 1
+
+    @classmethod
+    def build(cls, image, bin_size=BIN_SIZE, detector=None, per_bin=None):
+        """Detect features in the whole image and sort them into bins.
+
+        With `per_bin`, only keep that many of the strongest features per bin.
+        """
+        if detector is None:
+            detector = cv2.AKAZE_create()
+        keypoints, descriptors = detector.detectAndCompute(image, None)
+        features = MapFeatures.from_keypoints(keypoints, descriptors)
+        logger.info("Detected %d features in %r image", len(keypoints), image.shape)
+        if per_bin and keypoints:
+            responses = numpy.float32([k.response for k in keypoints])
+            keep = strongest_per_bin(features.points, responses, bin_size, per_bin)
+            features = MapFeatures(features.points[keep], features.descriptors[keep])
+        return cls.from_features(features, image.shape[:2], bin_size)
+
+    @classmethod
+    def from_features(cls, features, shape, bin_size=BIN_SIZE):
+        height, width = shape
+        bins_y = math.ceil(height / bin_size)
+        bins_x = math.ceil(width / bin_size)
+
+        bx = (features.points[:, 0] // bin_size).astype(numpy.intp)
+        by = (features.points[:, 1] // bin_size).astype(numpy.intp)
+        bins = by * bins_x + bx
+        order = numpy.argsort(bins, kind="stable")
+
+        # start of every bin, plus one extra bin per row that starts where the
+        # first bin of the next row does, so a row can be sliced up to bx + 1
+        flat_start = numpy.searchsorted(bins[order], numpy.arange(bins_y * bins_x + 1))
+        bin_start = numpy.empty((bins_y + 1, bins_x + 1), numpy.intp)
+        bin_start[:-1, :-1] = flat_start[:-1].reshape(bins_y, bins_x)
+        bin_start[:-1, -1] = flat_start[bins_x::bins_x]
+        bin_start[-1, :] = flat_start[-1]
+
+        return cls(
+            numpy.ascontiguousarray(features.points[order]),
+            numpy.ascontiguousarray(features.descriptors[order]),
+            bin_start,
+            bin_size,
+        )
+
+    _ARRAYS = ("points", "descriptors", "bin_start")
+
+    @classmethod
+    def load(cls, path):
+        """Load an index saved to the directory `path`, memory mapped.
+
+        Raises `FileNotFoundError` if saving it did not complete.
+        """
+        path = pathlib.Path(path)
+        bin_size = int(numpy.load(path / "bin_size.npy"))
+        arrays = [numpy.load(path / f"{a}.npy", mmap_mode="r") for a in cls._ARRAYS]
+        return cls(*arrays, bin_size)
+
+    def save(self, path):
+        path = pathlib.Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        (path / "bin_size.npy").unlink(missing_ok=True)
+        for a in self._ARRAYS:
+            numpy.save(path / f"{a}.npy", getattr(self, a))
+        # written last, marks the index as complete
+        numpy.save(path / "bin_size.npy", self.bin_size)
+
+    def __len__(self):
+        return len(self.points)
+
+    def lookup(self, slices):
+        """Features inside the box `image[slices]`, relative to the box."""
+        rows, cols = slices
+        top, bottom = max(rows.start, 0), max(rows.stop, 0)
+        left, right = max(cols.start, 0), max(cols.stop, 0)
+
+        by0 = min(top // self.bin_size, self.bins_y)
+        by1 = min((bottom - 1) // self.bin_size + 1, self.bins_y)
+        bx0 = min(left // self.bin_size, self.bins_x)
+        bx1 = min((right - 1) // self.bin_size + 1, self.bins_x)
+
+        parts = [
+            slice(self.bin_start[by, bx0], self.bin_start[by, bx1])
+            for by in range(by0, by1)
+        ]
+        points = numpy.concatenate([self.points[s] for s in parts] or [self.points[:0]])
+        descriptors = numpy.concatenate(
+            [self.descriptors[s] for s in parts] or [self.descriptors[:0]]
+        )
+
+        # bins on the border of the box are only partially inside
+        x, y = points[:, 0], points[:, 1]
+        inside = (left <= x) & (x < right) & (top <= y) & (y < bottom)
+        points = points[inside] - numpy.float32([cols.start, rows.start])
+        return MapFeatures(points, descriptors[inside])
+
+
+def index_path(map_name, bin_size=BIN_SIZE):
+    return artifact_path(
+        "features",
+        map_path(map_name),
+        dict(canny=CANNY_THRESHOLDS, bin_size=bin_size),
+        suffix="",
+    )
+
+
+def global_index_path(map_name, level, bin_size, per_bin):
+    return artifact_path(
+        "global_features",
+        map_path(map_name),
+        dict(canny=CANNY_THRESHOLDS, level=level, bin_size=bin_size, per_bin=per_bin),
+        suffix="",
+    )
+
+
+def load_global_index(map_name, level=0, bin_size=BIN_SIZE, per_bin=8):
+    """Strongest features of the map at pyramid `level`, built on first use."""
+    p = global_index_path(map_name, level, bin_size, per_bin)
+    try:
+        return FeatureIndex.load(p)
+    except FileNotFoundError:
+        pass
+    index = FeatureIndex.build(
+        load_map_edges(map_name, level), bin_size, per_bin=per_bin
+    )
+    index.save(p)
+    logger.info("Saved %d global features to %s", len(index), p)
+    return index
+
+
+def load_feature_index(map_name):
+    """Load the prebuilt index for `map_name` or None if there is none."""
+    p = index_path(map_name)
+    try:
+        index = FeatureIndex.load(p)
+    except FileNotFoundError:
+        logger.info(
+            "No feature index %s, detecting features per cell. "
+            "Build it with `python -m %s %s`",
+            p,
+            __name__,
+            map_name,
+        )
+        return None
+    logger.debug("Loaded %d features from %s", len(index), p)
+    return index
+
+
+def main(map_name="map4096x4096"):
+    logging.basicConfig(level=logging.DEBUG)
+
+    edges = load_map_edges(map_name)
+    index = FeatureIndex.build(edges)
+    p = index_path(map_name)
+    index.save(p)
+    logger.info("Saved %d features to %s", len(index), p)
+    load_global_index(
+        map_name,
+        get_config("source", "relocalize", "level"),
+        get_config("source", "relocalize", "bin_size"),
+        get_config("source", "relocalize", "per_bin"),
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(*sys.argv[1:]))
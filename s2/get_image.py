@@ -1,10 +1,7 @@
 import logging
 import sys
 
-import numpy
-import PIL.Image
-import PIL.ImageGrab
-
+from s2.capture import create_backend
 from s2.config import get_config
 from s2.util import IMG
 
@@ -14,47 +11,40 @@ if sys.platform == "win32":
     from .hwnd import Window
 
 
-_debug_image_counter = 0
+_backend = None
 
 
-def _get_debug_image(area):
-    global _debug_image_counter
-    try:
-        p = get_config("debug", "images")[_debug_image_counter]
-    except IndexError:
-        sys.exit()  # stops current thread
+def get_backend():
+    """The capture backend, replaying `debug.images` if there are any."""
+    global _backend
+    if _backend is None:
+        debug_images = get_config("debug", "images")
+        name = get_config("get_image", "backend")
+        if debug_images:
+            _backend = create_backend("replay", debug_images)
+        elif name == "replay":
+            _backend = create_backend(name, **get_config("get_image", "replay"))
+        else:
+            _backend = create_backend(name)
+    return _backend
 
-    logger.debug(
-        "using Debug image %d: %s",
-        _debug_image_counter,
-        p,
-    )
-    _debug_image_counter += 1
 
-    i = PIL.Image.open(p)
-    if area:
-        l, t, r, b = area
-        rgb = numpy.array(i)
-        rgb = rgb[t:b, l:r]
-        return IMG.from_rgb(rgb)
-    return IMG.from_image(i)
+def frame_time():
+    """When the last frame was captured, or recorded if it is replayed."""
+    return get_backend().time()
 
 
 _last_wnd = None
 
 
-def get_image(area=None) -> IMG:
-    """Screenshot current ForeGroundWin if it matches."""
-
-    debug_images = get_config("debug", "images")
-    if debug_images:
-        return _get_debug_image(area)
+def _window_rect():
+    """(left, top, right, bottom) of the foreground window if it matches."""
+    global _last_wnd
 
     title = get_config("get_image", "title")
     size = get_config("get_image", "size")
 
     wnd = Window.get_foreground_window()
-    global _last_wnd
 
     if not wnd:
         if _last_wnd != wnd:
@@ -76,11 +66,34 @@ def get_image(area=None) -> IMG:
             logger.info("Size Mismatch %s, %r", r, wnd)
         return None
 
+    return r
+
+
+def get_image(area=None, same_frame=False) -> IMG:
+    """Screenshot current ForeGroundWin if it matches.
+
+    Only grab `area` (left, top, right, bottom) of the window if given.
+    `same_frame` grabs from the same frame as the previous call, which only
+    makes a difference for replayed images.
+
+    Without windows to look for, as on X11, the game is at
+    `get_image.region` of the screen, or fills the whole screen.
+    """
+
+    backend = get_backend()
+    if not backend.screen:
+        return backend.grab(area, same_frame)
+
+    if sys.platform == "win32":
+        r = _window_rect()
+        if r is None:
+            return None
+    else:
+        r = get_config("get_image", "region") or None
+
     if area:
-        x, y = r[:2]
+        x, y = r[:2] if r else (0, 0)
         l, t, r, b = area
-        r = l + x, t + y, r + x, t + y
+        r = l + x, t + y, r + x, b + y
 
-    img = PIL.ImageGrab.grab(r, all_screens=True)
-    img = IMG(image=img)
-    return img
+    return backend.grab(r)
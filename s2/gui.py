@@ -1,3 +1,4 @@
+import collections
 import functools
 import logging
 import math
@@ -9,12 +10,15 @@ import time
 import PIL.Image
 import PIL.ImageTk
 import pathlib
+import queue
 
 from s2.config import get_config
 from s2.pois import load_pois, PointOfInterest
 from s2.get_image import get_image
-
-from .util import IMG
+from s2.metrics import METRICS
+from s2.pipeline import LatestQueue
+from s2.tiles import TileLayer, TilePyramid
+from s2.util import GridIndex
 
 try:
     import hotkey
@@ -38,6 +42,119 @@ def load_icon(ico):
     return PIL.ImageTk.PhotoImage(PIL.Image.open(f"icons/{ico}.png"))
 
 
+class PoiLayer:
+    """Canvas images of the points of interest in view.
+
+    POIs are indexed by their position in pixels of `map_name`. Only those
+    in view have a canvas image, which is created and deleted as they enter
+    and leave it. `margin` is the size of the icons, which are drawn right
+    and below of their position.
+
+    Like the tiles of `TileLayer`, images are tagged with `tag` and only
+    placed when they come into view.
+    """
+
+    def __init__(
+        self, canvas, map_name, cell_size=256, margin=32, icon=load_icon, tag="map"
+    ):
+        self.canvas = canvas
+        self.map_name = map_name
+        self.margin = margin
+        self.icon = icon
+        self.tag = tag
+        self.index = GridIndex(cell_size)
+        self.pois = []
+        self.items = {}  # index in pois: canvas item
+        self.scale = None
+
+    def add(self, poi):
+        x, y = poi.position.relative(self.map_name).round()
+        self.index.add(x, y, len(self.pois))
+        self.pois.append((poi, x, y))
+
+    def show(self, scale, left, top, width, height):
+        """Show the POIs in view.
+
+        The pixel `left, top` of the map scaled by `scale` is at the canvas
+        origin. POIs already shown are assumed to be there already, unless
+        the scale changed.
+        """
+        if scale != self.scale:
+            self.scale = scale
+            for item in self.items.values():
+                self.canvas.delete(item)
+            self.items.clear()
+
+        visible = set(
+            self.index.query(
+                (left - self.margin) / scale,
+                (top - self.margin) / scale,
+                (left + width) / scale,
+                (top + height) / scale,
+            )
+        )
+
+        for i in self.items.keys() - visible:
+            self.canvas.delete(self.items.pop(i))
+
+        for i in visible - self.items.keys():
+            poi, x, y = self.pois[i]
+            draw_x, draw_y = round(x * scale) - left, round(y * scale) - top
+            self.items[i] = self.canvas.create_image(
+                draw_x, draw_y, anchor="nw", image=self.icon(poi.icon), tags=self.tag
+            )
+
+
+class Motion:
+    """Player position between the last two updates.
+
+    The player is drawn one update behind: after an update, it moves from
+    where it was drawn to the update during the time between the last two
+    updates and then stays there. Extrapolating is left to the tracker,
+    which sends updates at a fixed rate also between fixes.
+
+    Jumps further than `snap` pixels, or to an update with other `resets`
+    than the one before, are not animated.
+    """
+
+    def __init__(self, snap=100):
+        self.snap = snap
+        self.updates = collections.deque(maxlen=2)  # (time, RelativePosition)
+        self.resets = None
+
+    def add(self, t, position, resets=0):
+        if self.updates:
+            last_t, last = self.updates[-1]
+            if (
+                t <= last_t
+                or resets != self.resets
+                or last.frame != position.frame
+                or math.dist(last[:2], position[:2]) > self.snap
+            ):
+                self.updates.clear()
+            else:
+                self.updates.append((last_t, self.at(t)))
+        self.resets = resets
+        self.updates.append((t, position))
+
+    def at(self, t):
+        """Position at time `t` or None, before the first update."""
+        if not self.updates:
+            return None
+        t1, p1 = self.updates[-1]
+        if len(self.updates) < 2:
+            return p1
+        t0, p0 = self.updates[0]
+
+        f = min(max(0.0, (t - t1) / (t1 - t0)), 1.0)
+        turn = (p1.heading - p0.heading + math.pi) % (2 * math.pi) - math.pi
+        return p0._replace(
+            x=p0.x + f * (p1.x - p0.x),
+            y=p0.y + f * (p1.y - p0.y),
+            heading=p0.heading + f * turn,
+        )
+
+
 class GUI:
     def __init__(self):
         self.root = tkinter.Tk()
@@ -53,16 +170,26 @@ class GUI:
 
         self.canvas = c = tkinter.Canvas(self.frame, bg="grey")
         c.pack(fill=tkinter.BOTH, expand=True)
-        # c.bind("<MouseWheel>", lambda evt:c.scale(tkinter.ALL, evt.x, evt.y, 1.001 ** evt.delta, 1.001 ** evt.delta))
+        c.bind("<MouseWheel>", lambda evt: self.zoom(-1 if evt.delta > 0 else 1))
+        c.bind("<Button-4>", lambda evt: self.zoom(-1))
+        c.bind("<Button-5>", lambda evt: self.zoom(1))
         # c.bind('<ButtonPress-1>', lambda event: c.scan_mark(event.x, event.y))
         # c.bind("<B1-Motion>", lambda event: c.scan_dragto(event.x, event.y, gain=1))
 
         self.map_name = get_config("gui", "map")
-        self.map_image = IMG.from_path(f"{self.map_name}.png")
-
-        self.map_widget = c.create_image(
-            -0, -0, anchor="nw", image=self.map_image.photoimage
+        tiles = get_config("gui", "tiles")
+        self.level = tiles["level"]
+        self.tiles = TileLayer(
+            c,
+            TilePyramid(self.map_name, tiles["size"], tiles["levels"]),
+            tiles["cache"],
+            tiles["margin"],
         )
+        self.tiles.show(self.level, 0, 0, c.winfo_reqwidth(), c.winfo_reqheight())
+        self.map_offset = 0, 0  # of everything tagged "map"
+        self.most_recent_position = None
+        self.motion = Motion(**get_config("gui", "motion"))
+        self.shown_position = None
 
         self.player_widget = c.create_line(
             100,
@@ -74,7 +201,12 @@ class GUI:
             width=10,
         )
 
-        self.pois = []
+        self.pois = PoiLayer(
+            c,
+            self.map_name,
+            get_config("gui", "poi_grid"),
+            get_config("gui", "poi_margin"),
+        )
         for poi in load_pois():
             self.add_poi(poi)
 
@@ -92,34 +224,56 @@ class GUI:
         for hk in self.hotkeys:
             hk.register()
 
+        # Only the latest update is drawn, once per frame
+        self.mailbox = LatestQueue(1)
+        self.frame_interval = max(1, round(1000 / get_config("gui", "fps")))
+        self.rendered = 0
+        self.root.after(self.frame_interval, self.poll)
+
     def add_poi(self, poi):
-        rel = poi.position.relative(self.map_name)
-        wdg = self.canvas.create_image(
-            rel.x,
-            rel.y,
-            anchor="nw",
-            image=load_icon(poi.icon),
-        )
-        self.pois.append((poi, wdg))
+        self.pois.add(poi)
 
     def run(self):
         self.root.mainloop()
+        logger.info(
+            "Rendered %d updates, dropped %d stale ones",
+            self.rendered,
+            self.mailbox.dropped,
+        )
 
     def resize(self, evt):
         self.canvas.pack()
-        pass
+        self.draw()
 
-    def update(self, u):
+    def zoom(self, steps):
+        """Show `steps` levels of detail less, or more if negative."""
+        self.level = min(max(self.level + steps, 0), self.tiles.pyramid.levels - 1)
+        self.draw()
+
+    def update(self, u, t):
+        """Take the update `u`, received at time `t`."""
         assert u.id == "PLAYER"
 
         self.most_recent_position = u.position
+        self.motion.add(t, u.position.relative(self.map_name), u.resets)
+
+    def draw(self, position=None):
+        """Draw the player at `position`, or where it was drawn last."""
+        if position is None:
+            position = self.shown_position
+        if position is None:
+            return
+        self.shown_position = position
 
-        pos = u.position.relative(self.map_name)
+        pos = position.relative(self.map_name)
+        scale = 0.5**self.level
 
-        player_x, player_y = pos.round()
+        player_x, player_y = round(pos.x * scale), round(pos.y * scale)
 
-        center_x = self.frame.winfo_width() // 2
-        center_y = self.frame.winfo_height() // 2
+        width = self.frame.winfo_width()
+        height = self.frame.winfo_height()
+        center_x = width // 2
+        center_y = height // 2
 
         arrow_x = center_x + 50 * math.sin(pos.heading)
         arrow_y = center_y - 50 * math.cos(pos.heading)
@@ -129,18 +283,35 @@ class GUI:
         map_x = center_x - player_x
         map_y = center_y - player_y
 
-        self.canvas.coords(self.map_widget, (map_x, map_y))
+        # Scroll the tiles and POIs in view at once, then add those coming into it
+        self.canvas.move("map", map_x - self.map_offset[0], map_y - self.map_offset[1])
+        self.map_offset = map_x, map_y
+
+        self.tiles.show(self.level, -map_x, -map_y, width, height)
 
-        # breakpoint()
-        for poi, wdg in self.pois:
-            x, y = poi.position.relative(self.map_name).round()
-            draw_x, draw_y = x + map_x, y + map_y
-            self.canvas.coords(wdg, (draw_x, draw_y))
+        self.pois.show(scale, -map_x, -map_y, width, height)
 
         self.canvas.pack()
 
+    def poll(self):
+        """Take the latest update and draw the next animation frame."""
+        self.root.after(self.frame_interval, self.poll)
+        try:
+            t, u = self.mailbox.get_nowait()
+        except queue.Empty:
+            pass
+        else:
+            self.update(u, t)
+            self.rendered += 1
+            METRICS.count("rendered")
+
+        position = self.motion.at(time.monotonic())
+        if position is not None and position != self.shown_position:
+            with METRICS.timer("gui"):
+                self.draw(position)
+
     def send_update(self, u):
-        self.root.after(1, self.update, u)
+        self.mailbox.put((time.monotonic(), u))
 
     def create_poi_screenshot(self):
         lg = logging.getLogger(self.__class__.__qualname__).getChild(".screenshot")
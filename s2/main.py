@@ -20,10 +20,11 @@ def get_arg_parser():
 
 
 def run(config):
-    from . import gui, position_updater
+    from . import gui, metrics, position_updater
 
     g, send_update = gui.create()
 
+    monitor = metrics.start()
     pu = position_updater.create(config, send_update)
     put = threading.Thread(target=pu.run, daemon=True)
     put.start()
@@ -33,6 +34,7 @@ def run(config):
         pass
         pu.stop()
         put.join()
+        monitor.stop()
 
 
 def main():
@@ -0,0 +1,56 @@
+"""Load map images and images derived from them."""
+
+import pathlib
+
+import cv2
+import numpy
+import PIL.Image
+
+from s2.cache import cached_array
+from s2.util import CANNY_THRESHOLDS, IMG
+
+
+def map_path(map_name):
+    return pathlib.Path.cwd() / f"{map_name}.png"
+
+
+def load_map_image(map_name, level=0):
+    """The map as an `IMG` over a memory mapped RGB array.
+
+    The PNG is only decoded once to fill the cache. Afterwards the pixels are
+    paged in as they are used, without further copies. Levels > 0 are
+    downscaled by `2**level`.
+    """
+    source = map_path(map_name)
+
+    def compute():
+        if level:
+            img = load_map_image(map_name, level - 1)
+            size = img.width >> 1, img.height >> 1
+            return cv2.resize(img.rgb, size, interpolation=cv2.INTER_AREA)
+        with PIL.Image.open(source) as i:
+            return numpy.asarray(i.convert("RGB"))
+
+    params = dict(level=level) if level else {}
+    return IMG.from_rgb(cached_array("rgb", source, params, compute))
+
+
+def load_map_edges(map_name, level=0):
+    """Edges of the map, downscaled by `2**level`.
+
+    Levels > 0 form a pyramid of smaller edge images, for searching the whole
+    map.
+    """
+
+    source = map_path(map_name)
+
+    def compute():
+        img = load_map_image(map_name)
+        if level:
+            size = img.width >> level, img.height >> level
+            img = IMG.from_rgb(cv2.resize(img.rgb, size, interpolation=cv2.INTER_AREA))
+        return img.edges
+
+    return cached_array(
+        "edges", source, dict(canny=CANNY_THRESHOLDS, level=level), compute
+    )
@@ -0,0 +1,148 @@
+"""Match minimap descriptors against the descriptors of a map cell.
+
+A matcher is created once per map cell, cached together with the cell's
+features and reused for every frame. Select the backend with
+`source.minimap.matcher`.
+"""
+
+import math
+import typing
+
+import cv2
+import numpy
+
+FLANN_INDEX_LSH = 6
+RATIO = 0.8
+
+
+class Matches(typing.NamedTuple):
+    """Matches as index arrays, `query[i]` matches `train[i]` at `distance[i]`."""
+
+    query: numpy.ndarray
+    train: numpy.ndarray
+    distance: numpy.ndarray
+
+    def dmatches(self):
+        """As a list of `cv2.DMatch`, e.g. for `cv2.drawMatches`."""
+        return [
+            cv2.DMatch(int(q), int(t), float(d))
+            for q, t, d in zip(self.query, self.train, self.distance)
+        ]
+
+
+def knn_bruteforce(query, descriptors, k=2):
+    """Indices and distances of the `k` nearest `descriptors`, one row per query."""
+    distances, indices = cv2.batchDistance(
+        query, descriptors, cv2.CV_32S, normType=cv2.NORM_HAMMING, K=k
+    )
+    return indices, distances
+
+
+class BruteForceMatcher:
+    """Compare every query descriptor with every map descriptor."""
+
+    nbytes = 0
+
+    def __init__(self, descriptors):
+        self.descriptors = descriptors
+
+    def knn_match(self, query, k=2):
+        return knn_bruteforce(query, self.descriptors, k)
+
+    def knn_match_within(self, query, within, k=2):
+        """Like `knn_match`, only against the descriptors at indices `within`."""
+        indices, distances = knn_bruteforce(query, self.descriptors[within], k)
+        return numpy.where(indices >= 0, within[indices], -1), distances
+
+
+class FlannLshMatcher:
+    """Locality sensitive hashing, cost grows sub-linearly with the map cell."""
+
+    TABLES = 6
+    CANDIDATES = 4
+
+    def __init__(self, descriptors):
+        self.index = cv2.flann_Index(
+            descriptors,
+            dict(
+                algorithm=FLANN_INDEX_LSH,
+                table_number=self.TABLES,
+                key_size=12,
+                multi_probe_level=1,
+            ),
+        )
+        self.size = len(descriptors)
+        # one index entry per table and descriptor
+        self.nbytes = self.TABLES * len(descriptors) * 8
+
+    def knn_match(self, query, k=2):
+        return self.index.knnSearch(query, k, params=dict(checks=50))
+
+    def knn_match_within(self, query, within, k=2):
+        """Like `knn_match`, only against the descriptors at indices `within`.
+
+        Searches `CANDIDATES` times as many neighbours and keeps the nearest
+        `k` of them that are `within`.
+        """
+        indices, distances = self.knn_match(query, self.CANDIDATES * k)
+        allowed = numpy.zeros(self.size, bool)
+        allowed[within] = True
+        keep = (indices >= 0) & allowed[indices.clip(0, self.size - 1)]
+        order = numpy.argsort(~keep, axis=1, kind="stable")[:, :k]
+        indices = numpy.take_along_axis(indices, order, axis=1)
+        distances = numpy.take_along_axis(distances, order, axis=1)
+        indices[~numpy.take_along_axis(keep, order, axis=1)] = -1
+        return indices, distances
+
+
+MATCHERS = {
+    "bruteforce": BruteForceMatcher,
+    "flann_lsh": FlannLshMatcher,
+}
+
+
+def create_matcher(name, descriptors):
+    try:
+        cls = MATCHERS[name]
+    except KeyError:
+        raise ValueError(
+            "Unknown matcher, expecting one of", name, list(MATCHERS)
+        ) from None
+    return cls(descriptors)
+
+
+def ratio_test(indices, distances, ratio=RATIO):
+    """Best matches that are clearly better than the second best.
+
+    `indices` and `distances` are the two nearest neighbours per query, as
+    `knn_match` returns them. Missing neighbours have a negative index.
+    """
+    good = (indices[:, 1] >= 0) & (distances[:, 0] < ratio * distances[:, 1])
+    query = numpy.flatnonzero(good)
+    return Matches(query, indices[query, 0], distances[query, 0])
+
+
+def match_two_pass(matcher, points, query, responses, n, radius, area):
+    """Match in two passes, the second one only near the player.
+
+    The `n` query descriptors with the strongest `responses` are matched
+    against all map `points` to find the area of the map that the query
+    shows. Then all of the query is matched against the points within
+    `radius` of that area's center.
+
+    Matches in a single pass if the circle covers more than half of the
+    `area` that the points are spread over, then the first pass would cost
+    more than the second one saves, or if the first one finds too few
+    matches.
+    """
+    if len(query) > n and math.pi * radius**2 < area / 2:
+        strongest = numpy.argsort(responses)[::-1][:n]
+        coarse = ratio_test(*matcher.knn_match(query[strongest], 2))
+        if len(coarse.query) >= 3:
+            center = numpy.median(points[coarse.train], axis=0)
+            near = numpy.flatnonzero(
+                numpy.sum((points - center) ** 2, axis=1) < radius**2
+            )
+            if len(near) >= 2:
+                return ratio_test(*matcher.knn_match_within(query, near, 2))
+    return ratio_test(*matcher.knn_match(query, 2))
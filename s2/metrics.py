@@ -0,0 +1,204 @@
+"""Latency histograms of the steps that process a frame.
+
+Steps record their duration in `METRICS`, the registry of this process:
+
+    with METRICS.timer("capture"):
+        ...
+
+`Monitor` periodically logs p50/p95/p99 and frames per second, serves them as
+JSON over HTTP and writes them to a file on exit, as configured in `metrics`.
+"""
+
+import bisect
+import collections
+import contextlib
+import http.server
+import json
+import logging
+import math
+import pathlib
+import threading
+import time
+
+from s2.config import get_config
+
+logger = logging.getLogger(__name__)
+
+# Bucket upper bounds in seconds, 4 per doubling from 50µs to 13s
+BOUNDS = [50e-6 * 2 ** (i / 4) for i in range(73)]
+
+
+class Histogram:
+    """Durations counted in logarithmic buckets.
+
+    Percentiles are the upper bound of the bucket they fall into, at most 19%
+    more than the exact value.
+    """
+
+    def __init__(self):
+        self.counts = [0] * (len(BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        self.counts[bisect.bisect_left(BOUNDS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, p):
+        if not self.count:
+            return None
+        rank = math.ceil(self.count * p / 100)
+        seen = 0
+        for bound, n in zip(BOUNDS, self.counts):
+            seen += n
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def summary(self):
+        """Count and statistics in milliseconds."""
+        if not self.count:
+            return dict(count=0)
+        return dict(
+            count=self.count,
+            mean=1000 * self.total / self.count,
+            p50=1000 * self.percentile(50),
+            p95=1000 * self.percentile(95),
+            p99=1000 * self.percentile(99),
+            max=1000 * self.max,
+        )
+
+
+class Metrics:
+    """Histograms by name and rates of events. Can be used from several threads."""
+
+    def __init__(self, window=256):
+        self.histograms = collections.defaultdict(Histogram)
+        self.window = window
+        self._events = collections.defaultdict(
+            lambda: collections.deque(maxlen=self.window)
+        )
+        self._start = time.monotonic()
+        self._lock = threading.Lock()
+
+    def add(self, name, seconds):
+        with self._lock:
+            self.histograms[name].add(seconds)
+
+    @contextlib.contextmanager
+    def timer(self, name):
+        """Record the duration of the with block, also if it raises."""
+        t = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - t)
+
+    def count(self, name):
+        """Count an event, e.g. a frame, for its rate."""
+        with self._lock:
+            self._events[name].append(time.monotonic())
+
+    def rate(self, name):
+        """Events per second over the last `window` events."""
+        with self._lock:
+            events = self._events.get(name)
+            if not events or len(events) < 2 or events[-1] == events[0]:
+                return 0.0
+            return (len(events) - 1) / (events[-1] - events[0])
+
+    def snapshot(self):
+        """All statistics as a dict, ready for JSON."""
+        with self._lock:
+            histograms = {n: h.summary() for n, h in self.histograms.items()}
+            names = list(self._events)
+        return dict(
+            uptime=time.monotonic() - self._start,
+            rates={n: self.rate(n) for n in names},
+            latency_ms=histograms,
+        )
+
+    def summary_line(self):
+        snapshot = self.snapshot()
+        parts = [f"{n} {r:.1f}/s" for n, r in snapshot["rates"].items()]
+        for name, s in snapshot["latency_ms"].items():
+            if s["count"]:
+                parts.append(
+                    f"{name} p50 {s['p50']:.1f} p95 {s['p95']:.1f} p99 {s['p99']:.1f}"
+                )
+        return ", ".join(parts) + " ms"
+
+    def dump(self, path):
+        path = pathlib.Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(self.snapshot(), indent=2))
+
+
+METRICS = Metrics()
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = json.dumps(self.server.metrics.snapshot()).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(format, *args)
+
+
+class Monitor(threading.Thread):
+    """Log `metrics` every `log_interval` seconds, serve them at `address`.
+
+    `address` is `host:port` or empty. On `stop`, writes them to `dump`, if set.
+    """
+
+    def __init__(self, metrics, log_interval, address="", dump=""):
+        super().__init__(name="Metrics", daemon=True)
+        self.metrics = metrics
+        self.log_interval = log_interval
+        self.dump = dump
+        self.server = None
+        if address:
+            host, port = address.rsplit(":", 1)
+            self.server = http.server.ThreadingHTTPServer((host, int(port)), _Handler)
+            self.server.metrics = metrics
+            self.server.daemon_threads = True
+            logger.info("Serving metrics at http://%s:%d/", *self.server.server_address)
+        self._stopped = threading.Event()
+
+    def run(self):
+        if self.server:
+            threading.Thread(
+                target=self.server.serve_forever, name="MetricsHTTP", daemon=True
+            ).start()
+        while self.log_interval and not self._stopped.wait(self.log_interval):
+            logger.info("Metrics: %s", self.metrics.summary_line())
+
+    def stop(self):
+        self._stopped.set()
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+        if self.dump:
+            self.metrics.dump(self.dump)
+            logger.info("Wrote metrics to %s", self.dump)
+        logger.info("Metrics: %s", self.metrics.summary_line())
+
+
+def start():
+    """Start a `Monitor` of `METRICS` as configured in `metrics`."""
+    monitor = Monitor(
+        METRICS,
+        get_config("metrics", "log_interval"),
+        get_config("metrics", "http"),
+        get_config("metrics", "dump"),
+    )
+    monitor.start()
+    return monitor
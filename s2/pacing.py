@@ -0,0 +1,52 @@
+"""Pace screen captures to what the tracking needs."""
+
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class FramePacer:
+    """Paces captures at `fps`, faster when the player moves, slower while idle.
+
+    At `fast_speed` pixel/s or more, captures run at `max_fps`, in between the
+    rate grows linearly. After each capture that found neither minimap nor
+    map, the interval doubles up to `max_idle_interval` seconds. With `fps` 0,
+    captures run as fast as possible while something is found.
+    """
+
+    def __init__(self, fps, max_fps, fast_speed, max_idle_interval):
+        self.fps = fps
+        self.max_fps = max(fps, max_fps)
+        self.fast_speed = fast_speed
+        self.max_idle_interval = max_idle_interval
+        self.interval = 1 / fps if fps else 0.0
+        self.misses = 0
+        self._last = None
+
+    def wait(self):
+        """Sleep until the next capture is due."""
+        now = time.monotonic()
+        if self._last is not None:
+            delay = self._last + self.interval - now
+            if delay > 0:
+                time.sleep(delay)
+                now += delay
+        self._last = now
+
+    def found(self, speed):
+        """The capture found the minimap or map, the player moves at `speed`."""
+        if self.misses:
+            logger.info("Found the game again after %d misses", self.misses)
+        self.misses = 0
+        if not self.fps:
+            self.interval = 0.0
+            return
+        fast = min(1.0, speed / self.fast_speed) if self.fast_speed else 0.0
+        self.interval = 1 / (self.fps + (self.max_fps - self.fps) * fast)
+
+    def missed(self):
+        """The capture found neither minimap nor map, back off."""
+        self.misses += 1
+        base = 1 / (self.max_fps or 60)
+        self.interval = min(self.max_idle_interval, base * 2**self.misses)
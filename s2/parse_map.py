@@ -5,6 +5,7 @@ import cv2
 import numpy.linalg
 
 from s2.coords import RelativePosition
+from s2.util import IMG
 
 logger = logging.getLogger(__name__)
 
@@ -16,9 +17,14 @@ COORDS = {
 }
 
 
+def area_of_interest(size):
+    """Left, top, right, bottom of the map in a window of `size`."""
+    return COORDS[size]["area_of_interest"]
+
+
 def crop_image(array):
     height, width = array.shape[:2]
-    left, top, right, bottom = COORDS[width, height]["area_of_interest"]
+    left, top, right, bottom = area_of_interest((width, height))
     return array[top:bottom, left:right]
 
 
@@ -91,7 +97,13 @@ def get_arrow(poly):
 
 
 def parse_map(img):
-    rgb = crop_image(img.rgb)
+    """Find the player arrow in a screenshot of the full map."""
+    return parse_map_area(IMG.from_rgb(crop_image(img.rgb)))
+
+
+def parse_map_area(img):
+    """Find the player arrow in the area of interest of the full map."""
+    rgb = img.rgb
     hsv = cv2.cvtColor(rgb, cv2.COLOR_BGR2HSV)  # TODO: is img.rgb really BGR?
     mask = cv2.inRange(hsv, (100, 255, 150), (100, 255, 240))
     polygons = polygons_in_mask(mask)
@@ -121,8 +133,6 @@ def parse_map(img):
 
 
 def test(image="test/s2/map_with_arrow.png"):
-    from s2.util import IMG
-
     def debug_(f):
         f()
 
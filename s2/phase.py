@@ -0,0 +1,133 @@
+"""Follow the minimap from frame to frame by phase correlation.
+
+Between two frames the minimap moves by a few pixels and turns by a few
+degrees. Both can be measured with FFTs in a fraction of the time feature
+detection and matching take:
+
+1. the translation with `cv2.phaseCorrelate` of the two images
+2. the rotation with `cv2.phaseCorrelate` of their polar transforms, after
+   undoing the translation
+3. the translation again, after undoing the rotation
+
+and 2. and 3. once more, to refine the rotation.
+
+The images are the minimap's gray values. Its edges are too sparse, the
+correlation peak collapses as soon as the minimap turns.
+"""
+
+import functools
+import math
+import threading
+
+import cv2
+import numpy
+
+POLAR_ROWS = 360  # one per degree
+
+
+@functools.lru_cache
+def window(shape, inner):
+    """Round window that fades out to the border and around the arrow."""
+    h, w = shape
+    y, x = numpy.ogrid[:h, :w]
+    r = numpy.hypot(x - w / 2, y - h / 2)
+    outer = numpy.clip(r / (min(h, w) / 2), 0, 1)
+    hole = numpy.clip((r - inner) / inner, 0, 1)
+    win = numpy.cos(outer * math.pi / 2) ** 2 * numpy.sin(hole * math.pi / 2) ** 2
+    return win.astype(numpy.float32)
+
+
+@functools.lru_cache
+def _radius_weights(width):
+    # Polar rows near the center carry little angular information
+    return numpy.linspace(0, 1, width, dtype=numpy.float32)
+
+
+def _polar(image):
+    h, w = image.shape
+    polar = cv2.warpPolar(
+        image, (w // 2, POLAR_ROWS), (w / 2, h / 2), w / 2, cv2.WARP_POLAR_LINEAR
+    )
+    return polar * _radius_weights(w // 2)
+
+
+def estimate_motion(reference, image, win, iterations=2):
+    """Transform from `image` to `reference` coordinates and its response.
+
+    Both are float32 with their weighted mean removed. The response is near
+    1 for a clear correlation peak and near 0 for none. The rotation is
+    underestimated while the translation is off, each iteration measures
+    what is left of both.
+    """
+    h, w = reference.shape
+    polar_reference = _polar(reference * win)
+    (sx, sy), response = cv2.phaseCorrelate(reference * win, image * win)
+    angle = 0.0
+    for _ in range(iterations):
+        R = cv2.getRotationMatrix2D((w / 2, h / 2), angle, 1)
+        R[:, 2] -= sx, sy
+        moved = cv2.warpAffine(image, R, (w, h))
+        (_, rows), _ = cv2.phaseCorrelate(polar_reference, _polar(moved * win))
+        angle += rows * 360 / POLAR_ROWS
+
+        R = cv2.getRotationMatrix2D((w / 2, h / 2), angle, 1)
+        turned = cv2.warpAffine(image, R, (w, h))
+        (sx, sy), response = cv2.phaseCorrelate(reference * win, turned * win)
+
+    T = numpy.vstack([R, [0, 0, 1]])
+    T[:2, 2] -= sx, sy
+    return T, response
+
+
+class PhaseTracker:
+    """Chain frame to frame motion onto the last known minimap to map transform.
+
+    `reset` sets a frame with a known transform, usually from feature
+    matching. `track` then returns the transform of every following frame,
+    until the correlation response drops below `min_response` or
+    `max_frames` frames were chained and errors might have added up. Then
+    it returns None until the next `reset`.
+    """
+
+    def __init__(self, min_response=0.5, max_frames=10, inner=12):
+        self.min_response = min_response
+        self.max_frames = max_frames
+        self.inner = inner
+        self.tracked = 0
+        self._reference = None
+        self._lock = threading.Lock()
+
+    def _prepare(self, gray):
+        win = window(gray.shape, self.inner)
+        image = gray.astype(numpy.float32)
+        image -= (image * win).sum() / win.sum()
+        return image, win
+
+    def reset(self, gray, M):
+        image, _ = self._prepare(gray)
+        with self._lock:
+            self._reference = image, M
+            self.tracked = 0
+
+    def clear(self):
+        """Stop tracking until the next `reset`."""
+        with self._lock:
+            self._reference = None
+
+    def track(self, gray):
+        """Transform from `gray` to the map or None."""
+        with self._lock:
+            if self._reference is None or self.tracked >= self.max_frames:
+                return None
+            reference, M = self._reference
+            image, win = self._prepare(gray)
+            if image.shape != reference.shape:
+                return None
+            T, response = estimate_motion(reference, image, win)
+            if response < self.min_response:
+                self._reference = None
+                return None
+            M = M @ T
+            self._reference = image, M
+            self.tracked += 1
+            return M
@@ -1,15 +1,133 @@
+import concurrent.futures
+import importlib
+import logging
+import multiprocessing
 import queue
 import threading
 import time
+import typing
+from multiprocessing import shared_memory
+
+import numpy
 
 STOP = object()
 
+logger = logging.getLogger(__name__)
+
+_attached = {}  # shared memory by name, that this process created or attached
+
+
+def _attach(name):
+    try:
+        return _attached[name]
+    except KeyError:
+        pass
+    shm = shared_memory.SharedMemory(name)
+    _attached[name] = shm
+    return shm
+
+
+class SharedArray(typing.NamedTuple):
+    """Reference to an array in a `SharedRing`, cheap to pickle."""
+
+    name: str
+    shape: tuple
+    dtype: str
+    slot: int
+
+    def get(self):
+        """The array, without copying it. Valid until its slot is released."""
+        shm = _attach(self.name)
+        size = int(numpy.prod(self.shape)) * numpy.dtype(self.dtype).itemsize
+        return numpy.ndarray(self.shape, self.dtype, shm.buf, offset=self.slot * size)
+
+
+class SharedRing:
+    """Arrays of one shape in shared memory, reused round robin.
+
+    `put` copies an array into the next free of `slots` slots and returns a
+    `SharedArray` that worker processes can read it through. The slot is in
+    use until it is `release`d, only then it is overwritten.
+    """
+
+    def __init__(self, shape, dtype=numpy.uint8, slots=16):
+        self.shape = tuple(shape)
+        self.dtype = numpy.dtype(dtype)
+        self.slots = slots
+        size = int(numpy.prod(self.shape)) * self.dtype.itemsize
+        self.shm = shared_memory.SharedMemory(create=True, size=size * slots)
+        _attached[self.shm.name] = self.shm
+        self._next = 0
+        self._in_use = [False] * slots
+        self._lock = threading.Lock()
+
+    def put(self, array):
+        """Copy `array` into a free slot, None if all are in use."""
+        with self._lock:
+            for i in range(self.slots):
+                slot = (self._next + i) % self.slots
+                if not self._in_use[slot]:
+                    break
+            else:
+                return None
+            self._in_use[slot] = True
+            self._next = (slot + 1) % self.slots
+        ref = SharedArray(self.shm.name, self.shape, self.dtype.str, slot)
+        ref.get()[...] = array
+        return ref
+
+    def release(self, ref):
+        """Let the slot of `ref` be overwritten."""
+        with self._lock:
+            self._in_use[ref.slot] = False
+
+    def close(self):
+        _attached.pop(self.shm.name, None)
+        self.shm.close()
+        self.shm.unlink()
+
+
+class LatestQueue(queue.Queue):
+    """Queue that drops its oldest items instead of blocking when full.
+
+    A stage that is slower than the one before it always gets the newest
+    frame instead of working through a backlog of stale ones.
+    """
+
+    def __init__(self, maxsize=1):
+        super().__init__(maxsize)
+        self.dropped = 0
+
+    def put(self, item, block=True, timeout=None):
+        with self.not_full:
+            while 0 < self.maxsize <= self._qsize():
+                self._get()
+                self.unfinished_tasks -= 1
+                self.dropped += 1
+            self._put(item)
+            self.unfinished_tasks += 1
+            self.not_empty.notify()
+
 
 class Stage(threading.Thread):
-    def __init__(self, q_in, task, q_out, name):
+    """Thread that calls `task` for every item of `q_in`, puts results on `q_out`.
+
+    Without `q_in` the stage is a source and calls `task()` without
+    arguments, without `q_out` it is a sink and drops the results. Results
+    that are None are not passed on.
+
+    With a `pool`, an `Executor`, the task runs in it. For a process pool,
+    `task` and the items must be picklable. Several stages can share a pool
+    and their queues to process items in parallel.
+    """
+
+    def __init__(self, q_in, task, q_out, name, pool=None):
         self.q_in = q_in
         self.task = task
         self.q_out = q_out
+        self.pool = pool
+        self._running = True
+        self.exception = None
         super().__init__(name=name, daemon=True)
 
     def run(self):
@@ -18,21 +136,31 @@ class Stage(threading.Thread):
         putting = 0
         cycles = 0
         try:
-            while True:
+            while self._running:
 
                 t = time.perf_counter()
-                args = self.q_in.get()
+                if self.q_in is None:
+                    args = ()
+                else:
+                    try:
+                        item = self.q_in.get(timeout=0.1)
+                    except queue.Empty:
+                        continue  # another stage on the same queue got the STOP
+                    if item is STOP:
+                        break
+                    args = (item,)
                 w = time.perf_counter() - t
 
-                if args is STOP:
-                    break
-
                 t = time.perf_counter()
-                result = self.task(*args)
+                if self.pool is None:
+                    result = self.task(*args)
+                else:
+                    result = self.pool.submit(self.task, *args).result()
                 d = time.perf_counter() - t
 
                 t = time.perf_counter()
-                self.q_out.put(result)
+                if result is not None and self.q_out is not None:
+                    self.q_out.put(result)
                 p = time.perf_counter() - t
 
                 waiting += w
@@ -40,8 +168,10 @@ class Stage(threading.Thread):
                 putting += p
                 cycles += 1
 
+        except Exception as e:
+            self.exception = e
         finally:
-            self.logger.debug(
+            logger.debug(
                 "Stage %s did %d cycles of Wait/do/put: %.3f %.3f %.3f",
                 self.name,
                 cycles,
@@ -51,9 +181,61 @@ class Stage(threading.Thread):
             )
 
     def stop(self):
+        self._running = False
+        if self.q_in is None:
+            return
         try:
             while True:
                 self.q_in.get_nowait()
-        except queue.empty:
+        except queue.Empty:
             pass
         self.q_in.put(STOP)
+
+
+def run_pipeline(tasks, running):
+    """Run `tasks`, a list of `(name, function)`, as a pipeline of stages.
+
+    The first task is the source, the others get the result of the task
+    before. Runs until `running()` is false or a task raised an exception.
+    Then stops the stages from source to sink, letting each finish its
+    current item, and raises the exception, if any.
+
+    A task can be `(name, function, processes)` to run it in a pool of
+    that many worker processes, see `Stage`.
+    """
+    processes = [t[2] if len(t) > 2 else 0 for t in tasks]
+    queues = [LatestQueue(max(1, *n)) for n in zip(processes, processes[1:])]
+    pools = []
+    stages = []
+    for (name, task, *_), n, q_in, q_out in zip(
+        tasks, processes, [None, *queues], [*queues, None]
+    ):
+        if not n:
+            stages.append(Stage(q_in, task, q_out, name))
+            continue
+        pool = concurrent.futures.ProcessPoolExecutor(
+            n,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=importlib.import_module,
+            initargs=(task.__module__,),
+        )
+        pools.append(pool)
+        for f in [pool.submit(int) for _ in range(n)]:
+            f.result()  # start the workers before the first item arrives
+        stages.extend(Stage(q_in, task, q_out, f"{name}-{i}", pool) for i in range(n))
+    for s in stages:
+        s.start()
+    try:
+        while running() and all(s.is_alive() for s in stages):
+            time.sleep(0.1)
+    finally:
+        for s in stages:
+            s.stop()
+            s.join()
+        for pool in pools:
+            pool.shutdown()
+        for (name, *_), q in zip(tasks[1:], queues):
+            logger.debug("Stage %s dropped %d stale items", name, q.dropped)
+    for s in stages:
+        if s.exception:
+            raise s.exception
@@ -1,11 +1,12 @@
-""" Update Player position by looking at the minimap. """
+"""Update Player position by looking at the minimap."""
 
 import datetime
 import functools
 import logging
 import math
-import pathlib
+import threading
 import time
+import weakref
 
 import cv2
 import numpy
@@ -13,20 +14,37 @@ import numpy.linalg
 import PIL.Image
 
 import s2.parse_map
+import s2.prefetch
+from s2.capture import ReplayFinished
 from s2.config import get_config
 from s2.coords import RelativePosition
-from s2.get_image import get_image
-from s2.util import IMG, Update
+from s2.feature_index import MapFeatures, load_feature_index, load_global_index
+from s2.get_image import frame_time, get_image
+from s2.maps import load_map_edges
+from s2.matcher import create_matcher, match_two_pass, ratio_test
+from s2.metrics import METRICS
+from s2.pacing import FramePacer
+from s2.phase import PhaseTracker
+from s2.pipeline import SharedRing, run_pipeline
+from s2.tracking import KalmanTracker, search_box
+from s2.transform import get_estimator
+from s2.util import IMG, LRUCache, Update
 
 COORDS = {
     (1920, 1080): {
-        "minimap_center": (918, 209),
+        "minimap_center": (918, 209),  # row, column
         "minimap_radius": 80,
     }
 }
 
 
-NOT_A_MINIMAP = "NOT A MINIMAP"
+def minimap_area(size):
+    """Left, top, right, bottom of the minimap in a window of `size`."""
+    coords = COORDS[size]
+    cy, cx = coords["minimap_center"]
+    r = coords["minimap_radius"]
+    return cx - r, cy - r, cx + r, cy + r
+
 
 logger = logging.getLogger(__name__)
 
@@ -46,18 +64,110 @@ def circle_mask(shape, center=None, radius=None):
     return mask
 
 
-def load_map_edges(map_name):
-    p = pathlib.Path.cwd() / f"{map_name}.edges.png"
+_local = threading.local()
+
+
+def akaze():
+    """AKAZE detector of the current thread, they can not be shared."""
     try:
-        img = PIL.Image.open(p)
-        return numpy.array(img)
-    except FileNotFoundError:
-        pass
-    img = IMG.from_path(p.parent / f"{map_name}.png")
-    e = img.edges
-    edges_img = PIL.Image.fromarray(e)
-    edges_img.save(p)
-    return e
+        return _local.akaze
+    except AttributeError:
+        _local.akaze = cv2.AKAZE_create()
+        return _local.akaze
+
+
+class Frame:
+    """One captured frame, filled in step by step by `PositionUpdater`.
+
+    After `share`, a frame pickles its images as references to shared memory.
+    Their slots are released when the frame is garbage collected, e.g. after
+    the worker that it was sent to returned. The frame that the worker
+    returns carries copies of the images.
+    """
+
+    IMAGES = ("minimap", "map")
+
+    def __init__(self, minimap, size, map_name):
+        self.minimap = minimap
+        self.size = size
+        self.map_name = map_name
+        self.time = time.monotonic()  # of the capture, see `frame_time`
+        self.captured = self.time  # for the latency, also when replaying
+        self.debug_format = dict(time=time.time(), datetime=datetime.datetime.now())
+        self.map = None  # area of interest of the full map, if there is no minimap
+        self.points = None
+        self.responses = None
+        self.descriptors = None
+        self.features = None  # of the map cell that is searched, with its matcher
+        self.slices = None
+        self.position = None
+        self.certainty = None
+        self.transform = None  # from minimap to map pixels
+        self.relocalized = None  # position found searching the whole map or False
+        self.timings = {}  # seconds by step, of steps that may run in other processes
+        self._shared = {}
+
+    def share(self, ring):
+        """Copy the images into the `SharedRing` that `ring(shape)` returns.
+
+        Images that find no free slot are pickled themselves.
+        """
+        for name in self.IMAGES:
+            img = getattr(self, name)
+            if img is None:
+                continue
+            r = ring(img.rgb.shape)
+            ref = r.put(img.rgb)
+            if ref is not None:
+                self._shared[name] = ref
+                weakref.finalize(self, r.release, ref)
+
+    def __getstate__(self):
+        state = dict(self.__dict__, **self._shared)
+        return state
+
+    def __setstate__(self, state):
+        for name, ref in state["_shared"].items():
+            state[name] = IMG.from_rgb(ref.get())
+        state["_shared"] = {}  # the slots are only valid while the sender holds them
+        self.__dict__.update(state)
+
+
+def analyze(frame):
+    """Detect the minimap's features, or find the position on the map.
+
+    Only depends on the frame, so it can run in a worker process. Returns the
+    frame also if nothing was found, for its timings.
+    """
+    if frame.position is not None:
+        return frame
+
+    t = time.perf_counter()
+    if frame.map:
+        position = s2.parse_map.parse_map_area(frame.map)
+        frame.timings["parse_map"] = time.perf_counter() - t
+        if not position:
+            return frame
+        frame.position = position.relative(frame.map_name)
+        frame.certainty = 1.0
+        logger.debug("Using Position from Map: %r", frame.position)
+        return frame
+
+    # outer_mask = circle_mask(shape)
+    # inner_mask = circle_mask(shape, radius=15)
+    # mask = ~(inner_mask & outer_mask)
+    # https://docs.opencv.org/master/db/d70/tutorial_akaze_matching.html
+    keypoints, frame.descriptors = akaze().detectAndCompute(
+        frame.minimap.edges,
+        None,  # TODO: Mask
+    )
+    frame.timings["features"] = time.perf_counter() - t
+    if frame.descriptors is None:
+        logger.debug("No features in minimap")
+        return frame
+    frame.points = cv2.KeyPoint_convert(keypoints).reshape(-1, 2)
+    frame.responses = numpy.float32([k.response for k in keypoints])
+    return frame
 
 
 class PositionUpdater:
@@ -71,199 +181,485 @@ class PositionUpdater:
 
         self.map_name = get_config("source", "minimap", "map")
         self.position = RelativePosition(3100, 2600, 0, frame=self.map_name)
-        self.updates_since_last_fix = 0
         self.init = False
-        self._map_feature_cache = {}
+        self._map_feature_cache = LRUCache(
+            get_config("source", "minimap", "feature_cache", "entries"),
+            get_config("source", "minimap", "feature_cache", "bytes"),
+            lambda cell: sum(a.nbytes for a in cell[0]) + getattr(cell[1], "nbytes", 0),
+        )
+        self.sync_misses = 0
+        self.prefetcher = None
+        self._rings = {}
+        self.tracker = KalmanTracker(**get_config("source", "tracker", "filter"))
+        self.publisher = None
+        self.transform = get_config("source", "minimap", "transform")
+        self.failures = 0  # frames in a row without an accepted fix
+        self.relocalize_after = get_config("source", "relocalize", "after")
+        self.relocalize_wait = self.relocalize_after  # backs off while it fails
+        self.candidate = None  # relocalized position, until the tracker confirms it
+        self.global_index = None
+        phase = dict(get_config("source", "minimap", "phase"))
+        self.phase = None
+        if phase.pop("enabled"):
+            self.phase = PhaseTracker(**phase)
+        self.pacer = FramePacer(**get_config("source", "capture"))
 
     def stop(self):
+        """Let `run` return, the shared memory is freed when it has."""
         self._running = False
+        if self.publisher:
+            self.publisher.join()
+        if self.prefetcher:
+            self.prefetcher.stop()
+            self.prefetcher.join()
+
+    def _close_rings(self):
+        """Free the shared memory, once no stage can share frames any more."""
+        for ring in self._rings.values():
+            ring.close()
+        self._rings.clear()
 
     def _init(self):
         if self.init:
             return
         self.init = True
         self.map_edges = load_map_edges(self.map_name)
+        self.feature_index = load_feature_index(self.map_name)
 
-        self.akaze = cv2.AKAZE_create()
-        self.dm = cv2.DescriptorMatcher_create(cv2.DescriptorMatcher_BRUTEFORCE_HAMMING)
+        if get_config("source", "minimap", "prefetch_lookahead"):
+            self.prefetcher = s2.prefetch.Prefetcher(
+                self._map_feature_cache, self.compute_features, cv2.AKAZE_create
+            )
+            self.prefetcher.start()
+
+        if get_config("source", "relocalize", "after"):
+            threading.Thread(
+                target=self._load_global_index, name="GlobalIndex", daemon=True
+            ).start()
+
+    def _load_global_index(self):
+        index = load_global_index(
+            self.map_name,
+            get_config("source", "relocalize", "level"),
+            get_config("source", "relocalize", "bin_size"),
+            get_config("source", "relocalize", "per_bin"),
+        )
+        self.global_index = index, create_matcher("flann_lsh", index.descriptors)
+        logger.debug("Global index with %d features ready", len(index))
 
     def run(self):
         logger.info("Starting Screen Grabbing")
         self._init()
         self._running = True
-        while self._running:
-            time.sleep(0)
-            self.update()
+        if get_config("source", "tracker", "rate"):
+            self.publisher = threading.Thread(
+                target=self.publish, name="Publisher", daemon=True
+            )
+            self.publisher.start()
+        try:
+            if get_config("source", "pipeline"):
+                processes = get_config("source", "processes")
+                run_pipeline(
+                    [
+                        ("Capture", self.capture),
+                        (
+                            ("Analyze", analyze, processes)
+                            if processes
+                            else ("Analyze", self.analyze)
+                        ),
+                        ("Lookup", self.lookup),
+                        ("Match", self.match),
+                        ("Validate", self.validate),
+                    ],
+                    lambda: self._running,
+                )
+            else:
+                while self._running:
+                    self.update()
+        except ReplayFinished as e:
+            logger.info("Replay finished after %d frames", e.args[0])
+        finally:
+            self._close_rings()
+        logger.info(
+            "Map feature cache: %s, %d synchronous misses",
+            self._map_feature_cache.stats(),
+            self.sync_misses,
+        )
 
     def update(self):
-        img = get_image()
+        """Run all steps for one frame."""
+        frame = self.capture()
+        for step in self.analyze, self.lookup, self.match, self.validate:
+            if frame is None:
+                return
+            frame = step(frame)
+
+    def capture(self):
+        """Grab the minimap, or the full map if there is no minimap."""
+        size = tuple(get_config("get_image", "size"))
+        self.pacer.wait()
+        with METRICS.timer("capture"):
+            img = get_image(minimap_area(size))
 
         if not img:
-            return
-
-        self.updates_since_last_fix += 1
+            self.pacer.missed()
+            return None
+        METRICS.count("frames")
 
-        if self.config["debug"]["save_images"]:
-            self._debug_format = dict(
-                time=time.time(),
-                datetime=datetime.datetime.now(),
-            )
+        frame = Frame(img, size, self.map_name)
+        frame.time = frame_time()
 
-        position = self.parse_image(img)
+        @self.debug_img(frame)
+        def screenshot():
+            return img
 
-        if not position:
+        with METRICS.timer("arrow"):
+            arrow = self.get_minimap_arrow(img)
+        if arrow is None:
+            # paced once `lookup` knows whether the map was found
+            frame.map = get_image(s2.parse_map.area_of_interest(size), same_frame=True)
+            if not frame.map:
+                self.pacer.missed()
+                return None
+        else:
+            self.pacer.found(self.tracker.speed)
+            if self.phase:
+                with METRICS.timer("phase"):
+                    frame.transform = self.phase.track(img.gray)
+                if frame.transform is not None:
+                    frame.position = self.transform_position(frame.transform, img)
+                    frame.certainty = 0.5
+        if get_config("source", "processes"):
+            frame.share(self._ring)
+        return frame
+
+    def _ring(self, shape):
+        ring = self._rings.get(shape)
+        if ring is None:
+            ring = self._rings[shape] = SharedRing(shape)
+        return ring
+
+    def analyze(self, frame):
+        return analyze(frame)
+
+    def lookup(self, frame):
+        """Get the features of the map where the player probably is.
+
+        Paces the captures by whether a frame without minimap showed the map.
+        """
+        for name, seconds in frame.timings.items():
+            METRICS.add(name, seconds)
+        if frame.map:
+            if frame.position is None:
+                self.pacer.missed()  # neither minimap nor map
+            else:
+                self.pacer.found(self.tracker.speed)
+        if frame.position is None and frame.descriptors is None:
+            return None  # analyze found nothing
+        if frame.position is None:
+            frame.features, frame.slices = self.map_features(frame.time)
+        return frame
+
+    def failed(self, frame):
+        """Count a frame without an accepted fix, plan the next relocalization.
+
+        A relocalized position is searched around in the next frames, until
+        the tracker accepts it or the next relocalization. Every failed one
+        doubles the frames until the next, up to `source.relocalize.max_wait`.
+        """
+        self.failures += 1
+        if self.phase:
+            self.phase.clear()  # or the next frames follow a wrong position
+        if frame.relocalized is None:
             return
+        if frame.relocalized:
+            self.candidate = frame.relocalized
+        else:
+            self.candidate = None
+            self.relocalize_wait = min(
+                2 * self.relocalize_wait,
+                get_config("source", "relocalize", "max_wait"),
+            )
+        self.relocalize_after = self.failures + self.relocalize_wait
+
+    def validate(self, frame):
+        """Fuse the position into the tracked one and send updates."""
+        if frame.position is None:
+            self.failed(frame)
+            return None
+        position = frame.position
 
-        position, certainty = position
+        if self.tracker.t is not None and frame.time < self.tracker.t:
+            logger.debug("Discarded frame that was overtaken by a later one")
+            return None
 
-        if not self.validate_update(position, certainty):
-            return
+        if not self.tracker.add_fix(
+            frame.time, position.x, position.y, position.heading, frame.certainty
+        ):
+            logger.info(
+                "Discarded %r, %d fixes in a row",
+                position,
+                self.tracker.rejects,
+            )
+            self.failed(frame)
+            return None
 
-        self.updates_since_last_fix = 0
+        self.failures = 0
+        self.candidate = None
+        self.relocalize_after = self.relocalize_wait = get_config(
+            "source", "relocalize", "after"
+        )
 
-        dist = math.dist(self.position[:2], position[:2])
+        METRICS.count("fixes")
+        METRICS.add("latency", time.monotonic() - frame.captured)
+        estimate = self.tracker.predict(frame.time)
+        dist = math.dist(self.position[:2], estimate[:2])
+        self.position = RelativePosition(
+            estimate.x, estimate.y, estimate.heading, self.map_name
+        )
 
         logger.info(
             "Position moved %f: %r",
             dist,
-            position,
+            self.position,
         )
-        u = Update(position, "PLAYER")
-
-        self.send_update(u)
-        self.position = position
-
-    def validate_update(self, pos, cert):
-        if cert >= 1:
-            return True
-        # TODO: frame of reeference
-        dist = math.dist(self.position[:2], pos[:2])
-
-        if dist > 200 * cert:  # no hardcoded Values
-            logger.info(
-                "Discarded moved %f %r",
-                dist,
-                pos,
+        if not self.publisher:
+            self.send_update(
+                Update(
+                    self.position, "PLAYER", estimate.covariance, self.tracker.resets
+                )
             )
-            return False
-        return True
+        self.prefetch()
+        return None
 
-    def debug_img(self, function):
-        if not self.config["debug"]["save_images"]:
-            return
-        name = function.__name__
-        path = self.config["debug"]["save_images"].get(name)
-        if not path:
-            return
-        img = function()
-        p = path.format(**self._debug_format)
-        if isinstance(img, IMG):
-            img.image.save(p)
-        else:
-            PIL.Image.fromarray(img).save(p)
-
-    def parse_image(self, img):
-        @self.debug_img
-        def screenshot():
-            return img
-
-        position = self.parse_minimap(img)
-
-        if position is NOT_A_MINIMAP:
-            position = self.parse_map(img)
-
-        return position
-
-    def parse_map(self, img):
-        pos = s2.parse_map.parse_map(img)
-        if pos:
-            pos = pos.relative(self.map_name)
-            logger.debug("Using Position from Map: %r", pos)
-            return pos, 1.0
-
-    def map_features(self):
-        x, y = self.position.round()
+    def publish(self):
+        """Send the tracked position at a fixed rate, also between fixes."""
+        rate = get_config("source", "tracker", "rate")
+        timeout = get_config("source", "tracker", "timeout")
+        while self._running:
+            time.sleep(1 / rate)
+            now = frame_time()
+            if self.tracker.t is None or now - self.tracker.t > timeout:
+                continue
+            estimate = self.tracker.predict(now)
+            position = RelativePosition(
+                estimate.x, estimate.y, estimate.heading, self.map_name
+            )
+            self.send_update(
+                Update(position, "PLAYER", estimate.covariance, self.tracker.resets)
+            )
 
-        # TODO: add based on speed and heading ?
+    def debug_img(self, frame):
+        """Save the image the decorated function returns, if configured."""
+
+        def decorator(function):
+            if not self.config["debug"]["save_images"]:
+                return
+            name = function.__name__
+            path = self.config["debug"]["save_images"].get(name)
+            if not path:
+                return
+            img = function()
+            p = path.format(**frame.debug_format)
+            if isinstance(img, IMG):
+                img.image.save(p)
+            else:
+                PIL.Image.fromarray(img).save(p)
+
+        return decorator
+
+    def cell_key(self, x, y, box_size):
         groups = get_config("source", "minimap", "groups")
-        box_size = get_config("source", "minimap", "box_size")
-
-        x |= groups - 1
-        y |= groups - 1
+        return int(x) | groups - 1, int(y) | groups - 1, box_size
 
-        slices = (
+    def cell_slices(self, key):
+        x, y, box_size = key
+        groups = get_config("source", "minimap", "groups")
+        return (
             slice(y - box_size // 2 - groups // 2, y + box_size // 2 - groups // 2),
             slice(x - box_size // 2 - groups // 2, x + box_size // 2 - groups // 2),
         )
 
-        key = x, y
+    def search_area(self, t):
+        """Predicted position at time `t` and size of the box to search."""
+        if self.candidate is not None:
+            x, y = self.candidate[:2]
+            return x, y, get_config("source", "minimap", "max_box_size")
+        estimate = self.tracker.predict(t)
+        if estimate is None:
+            x, y = self.position[:2]
+            return x, y, get_config("source", "minimap", "box_size")
+        box_size = search_box(
+            estimate.sigma,
+            get_config("source", "minimap", "min_box_size"),
+            get_config("source", "minimap", "max_box_size"),
+            align=get_config("source", "minimap", "groups"),
+        )
+        return estimate.x, estimate.y, box_size
+
+    def compute_features(self, key, detector):
+        """Features of the cell and a matcher prepared for them."""
+        slices = self.cell_slices(key)
+        if self.feature_index is not None:
+            features = self.feature_index.lookup(slices)
+        else:
+            features = MapFeatures.from_keypoints(
+                *detector.detectAndCompute(self.map_edges[slices], None)
+            )
+        matcher = None
+        if len(features.points) >= 2:
+            matcher = create_matcher(
+                get_config("source", "minimap", "matcher"), features.descriptors
+            )
+        return features, matcher
+
+    def map_features(self, t):
+        key = self.cell_key(*self.search_area(t))
+        return self.cell_features(key), self.cell_slices(key)
+
+    def cell_features(self, key):
         features = self._map_feature_cache.get(key)
         if features is None:
-            features = self.akaze.detectAndCompute(self.map_edges[slices], None)
+            features = self.compute_features(key, akaze())
             self._map_feature_cache[key] = features
+            self.sync_misses += 1
+            logger.debug(
+                "Map feature cache miss %r, %d synchronous misses, %s",
+                key,
+                self.sync_misses,
+                self._map_feature_cache.stats(),
+            )
+        return features
 
-        return features, slices
-
-    def parse_minimap(self, img):
-        coords = COORDS[(img.width, img.height)]
-        cx, cy = coords["minimap_center"]
-        r = coords["minimap_radius"]
+    def prefetch(self):
+        """Request features of the cells on the predicted path."""
+        if not self.prefetcher:
+            return
+        groups = get_config("source", "minimap", "groups")
+        *_, box_size = self.search_area(frame_time())
+        path = s2.prefetch.predict_path(
+            self.tracker.history,
+            self.position.heading,
+            get_config("source", "minimap", "prefetch_lookahead"),
+            groups,
+        )
+        keys = dict.fromkeys(self.cell_key(x, y, box_size) for x, y in path)
+        self.prefetcher.request(keys)
 
-        minimap = IMG(rgb=img.rgb[cx - r : cx + r, cy - r : cy + r, :])
+    def match(self, frame):
+        """Find the position by matching the minimap against the map.
 
-        a = self.get_minimap_arrow(minimap)
-        if a is None:
-            return NOT_A_MINIMAP
+        Searches the whole map after `source.relocalize.after` frames in a row
+        without an accepted fix, also if the tracker rejected the fixes found
+        where the player was expected. Frames without a position are passed
+        on, for `validate` to count them as failures.
+        """
+        if frame.position is not None:
+            return frame
+
+        frame.position = self.locate(frame, frame.features, frame.slices)
+        frame.certainty = 0.5
+        if self.relocalize_after and self.failures >= self.relocalize_after:
+            with METRICS.timer("relocalize"):
+                position = self.relocalize(frame)
+            frame.relocalized = position or False
+            if position is not None:
+                frame.position = position
+        if frame.position is not None and self.phase:
+            self.phase.reset(frame.minimap.gray, frame.transform)
+        return frame
+
+    def transform_position(self, M, minimap):
+        """Position of the center of the minimap, transformed by `M`."""
+        x, y, scale = M @ [minimap.width / 2, minimap.height / 2, 1]
+        heading = -math.atan2(M[0, 1], M[0, 0])
+        return RelativePosition(x / scale, y / scale, heading, frame=self.map_name)
 
-        # outer_mask = circle_mask(shape)
-        # inner_mask = circle_mask(shape, radius=15)
-        # mask = ~(inner_mask & outer_mask)
-        # https://docs.opencv.org/master/db/d70/tutorial_akaze_matching.html
-        minimap_keypoints, minimap_descriptors = self.akaze.detectAndCompute(
-            minimap.edges,
-            None,  # TODO: Mask
+    def relocalize(self, frame):
+        """Match against the global index, then refine in the cell found."""
+        if self.global_index is None:
+            return None
+        index, matcher = self.global_index
+        good = ratio_test(*matcher.knn_match(frame.descriptors, 2))
+        _, min_points = get_estimator(self.transform["model"])
+        if len(good.query) < max(self.transform["min_matches"], min_points):
+            logger.debug("Relocalization found %d matches", len(good.query))
+            return None
+        M = self.get_translation(
+            frame.minimap,
+            frame.points[good.query].reshape(-1, 1, 2),
+            index.points[good.train].reshape(-1, 1, 2),
         )
+        if M is None:
+            return None
+        center = M @ [frame.minimap.width / 2, frame.minimap.height / 2, 1]
+        x, y = center[:2] / center[2] * 2 ** get_config("source", "relocalize", "level")
+        logger.info("Relocalized near %.0f %.0f after %d failures", x, y, self.failures)
 
-        (map_keypoints, map_descriptors), offset_slices = self.map_features()
+        key = self.cell_key(x, y, get_config("source", "minimap", "box_size"))
+        return self.locate(frame, self.cell_features(key), self.cell_slices(key))
+
+    def locate(self, frame, features, offset_slices):
+        """Position of the minimap in the cell `offset_slices` or None."""
+        minimap = frame.minimap
+        minimap_points = frame.points
+        minimap_descriptors = frame.descriptors
+        (map_points, _), matcher = features
 
         offset = numpy.array([offset_slices[1].start, offset_slices[0].start])
 
-        matches = self.dm.knnMatch(minimap_descriptors, map_descriptors, 2)
-        good = [m for m, n in matches if m.distance < 0.8 * n.distance]
+        if matcher is None:
+            logger.debug("No features to match")
+            return None
 
-        # TODO: calculate center of good, then filter map_features by distance
-        # and match again
+        # the map the minimap shows, with a margin for the error of the center
+        radius = minimap.width / 2 * self.transform["scale"] + get_config(
+            "source", "minimap", "two_pass", "margin"
+        )
+        area = (offset_slices[0].stop - offset_slices[0].start) * (
+            offset_slices[1].stop - offset_slices[1].start
+        )
+        with METRICS.timer("matching"):
+            good = match_two_pass(
+                matcher,
+                map_points,
+                minimap_descriptors,
+                frame.responses,
+                get_config("source", "minimap", "two_pass", "keypoints"),
+                radius,
+                area,
+            )
 
-        if len(good) < 6:
+        _, min_points = get_estimator(self.transform["model"])
+        if len(good.query) < max(self.transform["min_matches"], min_points):
 
-            @self.debug_img
+            @self.debug_img(frame)
             def minimap_with_too_few_matches():
                 box = self.map_edges[offset_slices].copy()
                 op = tuple(numpy.array(self.position[:2]) - offset)
                 cv2.circle(box, op, 5, (0x00, 0x00, 0xFF), 1)
                 return cv2.drawMatches(
                     minimap.rgb,
-                    minimap_keypoints,
+                    cv2.KeyPoint_convert(minimap_points),
                     box,
-                    map_keypoints,
-                    good,
+                    cv2.KeyPoint_convert(map_points),
+                    good.dmatches(),
                     None,
                     flags=cv2.DrawMatchesFlags_NOT_DRAW_SINGLE_POINTS,
                 )
 
             logger.debug(
-                "Did not find enough good matches, %d %d", len(matches), len(good)
+                "Did not find enough good matches, %d %d",
+                len(minimap_points),
+                len(good.query),
             )
-            return False
+            return None
 
-        src_pts = numpy.float32(
-            [minimap_keypoints[m.queryIdx].pt for m in good],
-        ).reshape(-1, 1, 2)
-        dst_pts = numpy.float32(
-            [map_keypoints[m.trainIdx].pt for m in good],
-        ).reshape(-1, 1, 2)
+        src_pts = minimap_points[good.query].reshape(-1, 1, 2)
+        dst_pts = map_points[good.train].reshape(-1, 1, 2)
 
-        M = self.get_translation(img, src_pts, dst_pts)
+        with METRICS.timer("homography"):
+            M = self.get_translation(minimap, src_pts, dst_pts)
         if M is None:
             logger.info(
                 "Did not find Transformation Matrix",
@@ -280,10 +676,13 @@ class PositionUpdater:
 
         pos = position_in_box + offset
         pos = numpy.int32(pos)
+        frame.transform = (
+            numpy.array([[1, 0, offset[0]], [0, 1, offset[1]], [0, 0, 1]]) @ M
+        )
 
         heading = -math.atan2(M[0, 1], M[0, 0])
 
-        @self.debug_img
+        @self.debug_img(frame)
         def minimap_with_matches():
 
             arrow = [minimap.width / 2, 0, 1]
@@ -304,10 +703,10 @@ class PositionUpdater:
             cv2.circle(box, op, 5, (0x00, 0x00, 0xFF), 1)
             return cv2.drawMatches(
                 minimap.rgb,
-                minimap_keypoints,
+                cv2.KeyPoint_convert(minimap_points),
                 box,
-                map_keypoints,
-                good,
+                cv2.KeyPoint_convert(map_points),
+                good.dmatches(),
                 None,
                 # flags=cv2.DrawMatchesFlags_NOT_DRAW_SINGLE_POINTS,
             )
@@ -315,24 +714,22 @@ class PositionUpdater:
         logger.debug(
             "Position based on Minimap: %.1f %.1f %.1f°", *pos, math.degrees(heading)
         )
-        pos = RelativePosition(
+        return RelativePosition(
             *pos,
             heading,
             frame=self.map_name,
         )
-        return pos, 0.5
 
     def get_translation(self, img, src_pts, dst_pts):
-        M, mask = cv2.findHomography(
+        estimate, _ = get_estimator(self.transform["model"])
+        return estimate(
             src_pts,
             dst_pts,
-            cv2.RANSAC,
-            2,
-            None,
-            1000,
-            0.999,
+            self.transform["threshold"],
+            self.transform["max_iterations"],
+            self.transform["confidence"],
+            scale=self.transform["scale"],
         )
-        return M
 
     def get_minimap_arrow(self, mm):
         """Look for the Minimap Arrow.
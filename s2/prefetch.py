@@ -0,0 +1,79 @@
+"""Compute map features ahead of the player on a background thread."""
+
+import logging
+import math
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+def predict_path(history, heading, lookahead, step):
+    """Points where the player will be during the next `lookahead` seconds.
+
+    `history` is a sequence of `(time, x, y)`, oldest first. The velocity is
+    taken from it. Without a usable velocity, one `step` along `heading` is
+    predicted. Points are `step` apart.
+    """
+    t1, x1, y1 = history[-1]
+    t0, x0, y0 = history[0]
+    dt = t1 - t0
+    if dt > 0 and (x1, y1) != (x0, y0):
+        vx = (x1 - x0) / dt
+        vy = (y1 - y0) / dt
+    else:
+        vx = math.sin(heading) * step / lookahead
+        vy = -math.cos(heading) * step / lookahead
+
+    distance = math.hypot(vx, vy) * lookahead
+    n = max(1, math.ceil(distance / step))
+    return [
+        (x1 + vx * lookahead * i / n, y1 + vy * lookahead * i / n)
+        for i in range(1, n + 1)
+    ]
+
+
+class Prefetcher(threading.Thread):
+    """Fill `cache` with `compute(key, detector)` for requested keys.
+
+    Only the most recent request is worked on, keys of older requests that
+    were not reached yet are dropped. `compute` gets a detector of the
+    prefetcher's own, because OpenCV detectors must not be shared between
+    threads.
+    """
+
+    def __init__(self, cache, compute, create_detector):
+        self.cache = cache
+        self.compute = compute
+        self.create_detector = create_detector
+        self.prefetched = 0
+        self._wanted = []
+        self._running = True
+        self._cond = threading.Condition()
+        super().__init__(name="Prefetcher", daemon=True)
+
+    def request(self, keys):
+        with self._cond:
+            self._wanted = [k for k in keys if k not in self.cache]
+            self._cond.notify()
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+
+    def run(self):
+        detector = self.create_detector()
+        while True:
+            with self._cond:
+                while self._running and not self._wanted:
+                    self._cond.wait()
+                if not self._running:
+                    break
+                key = self._wanted.pop(0)
+
+            if key in self.cache:
+                continue
+            self.cache[key] = self.compute(key, detector)
+            self.prefetched += 1
+            logger.debug("Prefetched %r", key)
+        logger.debug("Prefetcher stopped after %d cells", self.prefetched)
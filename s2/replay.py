@@ -0,0 +1,187 @@
+"""Run the position updater headless on recorded frames.
+
+Reports frames per second, the time spent in each stage and, given a ground
+truth track, the position error of the frames that produced a fix and how
+many did not:
+
+    python -m s2.replay recording.mp4 --truth recording.track
+
+Frames are tracked at the time they were recorded, so the positions do not
+depend on how fast the machine replays them.
+
+A track has one line per frame with a known position, `index,position`,
+where position is in the format of `RelativePosition.from_string`:
+
+    0,map4096x4096:3100:2600:0
+    1,map4096x4096:3102:2598:0.1
+"""
+
+import argparse
+import functools
+import logging
+import logging.config
+import math
+import pathlib
+import statistics
+import sys
+import time
+
+from s2.coords import RelativePosition
+
+logger = logging.getLogger(__name__)
+
+
+def load_track(path):
+    """Map frame index to position from a track file."""
+    track = {}
+    for line in pathlib.Path(path).read_text().splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        index, position = line.split(",", 1)
+        track[int(index)] = RelativePosition.from_string(position.strip())
+    return track
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def _timed(obj, name, times):
+    """Replace the method `name` of `obj` with one that records its duration."""
+    method = getattr(obj, name)
+    times[name] = []
+
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        t = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            times[name].append(time.perf_counter() - t)
+
+    setattr(obj, name, wrapper)
+
+
+STAGES = [
+    "capture",
+    "get_minimap_arrow",
+    "analyze",
+    "lookup",
+    "match",
+    "get_translation",
+    "validate",
+]
+
+
+def replay(config, track=None):
+    """Feed every replayed frame to a PositionUpdater, return statistics."""
+    from s2 import position_updater
+    from s2.capture import ReplayFinished
+    from s2.get_image import get_backend
+
+    backend = get_backend()
+    fixes = []
+    pu = position_updater.create(config, fixes.append)
+    pu._init()
+
+    if track:
+        start = track[min(track)].relative(pu.map_name)
+        pu.position = start
+
+    times = {}
+    _timed(backend, "grab", times)
+    for name in STAGES:
+        _timed(pu, name, times)
+
+    frame_times = []
+    errors = []
+    missed = 0  # frames with a known position but without a fix
+    start = time.perf_counter()
+    try:
+        while True:
+            n = len(fixes)
+            t = time.perf_counter()
+            pu.update()
+            frame_times.append(time.perf_counter() - t)
+            truth = track and track.get(backend.index)
+            if not truth:
+                continue
+            if len(fixes) == n:
+                missed += 1
+                continue
+            truth = truth.relative(pu.map_name)
+            errors.append(math.dist(truth[:2], fixes[-1].position[:2]))
+    except ReplayFinished:
+        pass
+    finally:
+        pu.stop()
+        pu._close_rings()
+    duration = time.perf_counter() - start
+
+    return dict(
+        frames=len(frame_times),
+        fixes=len(fixes),
+        fps=len(frame_times) / duration,
+        times=dict(frame=frame_times, **times),
+        errors=errors,
+        missed=missed,
+    )
+
+
+def report(stats):
+    print(
+        f"{stats['frames']} frames, {stats['fixes']} fixes, {stats['fps']:.1f} frames/s"
+    )
+    print(f"{'stage':20} {'calls':>6} {'mean':>8} {'p50':>8} {'p95':>8} ms")
+    for name, times in stats["times"].items():
+        if not times:
+            continue
+        print(
+            f"{name:20} {len(times):6} {1000 * statistics.mean(times):8.2f}"
+            f" {1000 * percentile(times, 50):8.2f} {1000 * percentile(times, 95):8.2f}"
+        )
+    errors = stats["errors"]
+    if errors:
+        print(
+            f"position error over {len(errors)} fixes: mean {statistics.mean(errors):.1f}"
+            f" p50 {percentile(errors, 50):.1f} p95 {percentile(errors, 95):.1f}"
+            f" max {max(errors):.1f} pixel"
+        )
+    if errors or stats["missed"]:
+        print(f"{stats['missed']} frames with a known position without a fix")
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(
+        prog=f"{__package__}.replay", description=__doc__.partition("\n")[0]
+    )
+    parser.add_argument("source", help="video file or directory of frames")
+    parser.add_argument("--truth", type=pathlib.Path, help="ground truth track")
+    parser.add_argument("--speed", choices=["max", "recorded"], default="max")
+    parser.add_argument("--config", "-c", action="append", help="Config files .toml")
+    options = parser.parse_args(args)
+
+    from s2.config import load_configs
+
+    config = load_configs(options.config)
+    logging.config.dictConfig(config["logging"])
+
+    from s2.config import _the_config  # HACK ALERT
+
+    _the_config["get_image"]["backend"] = "replay"
+    _the_config["get_image"]["replay"] = dict(
+        config["get_image"]["replay"], source=options.source, speed=options.speed
+    )
+    _the_config["source"]["tracker"]["rate"] = 0
+    _the_config["source"]["capture"]["fps"] = 0  # the backend paces the frames
+    _the_config["debug"]["save_images"] = {}  # would distort the timing
+
+    track = load_track(options.truth) if options.truth else None
+    report(replay(config, track))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
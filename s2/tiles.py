@@ -0,0 +1,122 @@
+"""Draw the map on a canvas as tiles, only those in view.
+
+The map is cut into `size` x `size` tiles at several levels of detail, level
+`l` downscaled by `2**l`. Instead of one PhotoImage of the whole map,
+`TileLayer` keeps canvas images of the tiles in and around the view. Tiles
+that leave the view keep their PhotoImage in a bounded cache, in case they
+come back.
+"""
+
+import logging
+
+import PIL.Image
+import PIL.ImageTk
+
+from s2.maps import load_map_image
+from s2.util import LRUCache
+
+logger = logging.getLogger(__name__)
+
+
+def tile_keys(level, view, size, shape, margin=0):
+    """Keys `(level, column, row)` of the tiles that overlap `view`.
+
+    `view` is `(left, top, right, bottom)` in pixels of `level`, `shape`
+    the `(height, width)` of that level. Adds `margin` tiles on each side.
+    """
+    left, top, right, bottom = view
+    height, width = shape
+    columns = range(
+        max(0, int(left // size) - margin),
+        min(-(-width // size), int(right // size) + 1 + margin),
+    )
+    rows = range(
+        max(0, int(top // size) - margin),
+        min(-(-height // size), int(bottom // size) + 1 + margin),
+    )
+    return {(level, c, r) for r in rows for c in columns}
+
+
+class TilePyramid:
+    """Tiles of a map at `levels` levels of detail."""
+
+    def __init__(self, map_name, size=256, levels=4):
+        self.map_name = map_name
+        self.size = size
+        self.levels = levels
+        self._images = {}
+
+    def image(self, level):
+        try:
+            return self._images[level]
+        except KeyError:
+            pass
+        img = load_map_image(self.map_name, level)
+        self._images[level] = img
+        return img
+
+    def shape(self, level):
+        img = self.image(level)
+        return img.height, img.width
+
+    def keys(self, level, view, margin=0):
+        return tile_keys(level, view, self.size, self.shape(level), margin)
+
+    def tile(self, key):
+        """RGB array of the tile `key`, smaller at the right and bottom border."""
+        level, column, row = key
+        x, y = column * self.size, row * self.size
+        return self.image(level).rgb[y : y + self.size, x : x + self.size]
+
+
+def _photoimage(rgb):
+    return PIL.ImageTk.PhotoImage(PIL.Image.fromarray(rgb))
+
+
+class TileLayer:
+    """Canvas images of the tiles of `pyramid` in view.
+
+    Keeps at most `cache_size` PhotoImages of tiles out of view.
+    `photoimage` turns a tile's RGB array into an image for the canvas.
+
+    Tiles are only placed when they come into view and are tagged with
+    `tag`. Scrolling them is up to the owner of the canvas, with one
+    `canvas.move(tag, ...)`.
+    """
+
+    def __init__(
+        self, canvas, pyramid, cache_size=64, margin=1, photoimage=None, tag="map"
+    ):
+        self.canvas = canvas
+        self.pyramid = pyramid
+        self.margin = margin
+        self.tag = tag
+        self.photoimage = photoimage or _photoimage
+        self.cache = LRUCache(max_entries=cache_size)
+        self.items = {}  # key: (canvas item, photo image), the reference is needed
+
+    def show(self, level, left, top, width, height):
+        """Show the tiles of `level` with the pixel `left, top` at the canvas origin.
+
+        Tiles already shown are assumed to be there already.
+        """
+        size = self.pyramid.size
+        view = left, top, left + width, top + height
+        keys = self.pyramid.keys(level, view, self.margin)
+
+        for key in self.items.keys() - keys:
+            item, photo = self.items.pop(key)
+            self.canvas.delete(item)
+            self.cache[key] = photo
+
+        for key in keys - self.items.keys():
+            _, column, row = key
+            x, y = column * size - left, row * size - top
+            photo = self.cache.get(key)
+            if photo is None:
+                photo = self.photoimage(self.pyramid.tile(key))
+            item = self.canvas.create_image(
+                x, y, anchor="nw", image=photo, tags=self.tag
+            )
+            self.canvas.tag_lower(item)
+            self.items[key] = item, photo
@@ -0,0 +1,158 @@
+"""Track the player between position fixes."""
+
+import collections
+import math
+import threading
+import typing
+
+import numpy
+
+
+class Estimate(typing.NamedTuple):
+    """Tracked position with the covariance of x and y."""
+
+    x: float
+    y: float
+    heading: float
+    covariance: numpy.ndarray
+
+    @property
+    def sigma(self):
+        """Standard deviation along the more uncertain axis."""
+        return math.sqrt(max(self.covariance[0, 0], self.covariance[1, 1]))
+
+
+class KalmanTracker:
+    """Kalman filter of position and velocity with constant velocity motion.
+
+    Fixes with `certainty` 1 have an error of `sigma` pixels, less certain
+    fixes a proportionally larger one. The player can change speed by
+    `acceleration` pixel/s² and drives at most at `max_speed` pixel/s, which is
+    the velocity error after a reset.
+
+    Fixes further than `gate` standard deviations from the prediction are
+    outliers and rejected, unless they are certain, or the last `agree`
+    rejected fixes agree with each other, or `max_rejects` fixes in a row were
+    rejected. Then the player probably teleported and tracking starts over at
+    the fix. Fixes agree if they are no further apart than `gate` times their
+    errors plus the distance the player can drive in between. `resets` counts
+    how often tracking started over.
+    """
+
+    def __init__(
+        self,
+        sigma,
+        acceleration,
+        max_speed,
+        gate=3.0,
+        max_rejects=10,
+        agree=3,
+        history=8,
+    ):
+        self.sigma = sigma
+        self.acceleration = acceleration
+        self.max_speed = max_speed
+        self.gate = gate
+        self.max_rejects = max_rejects
+        self.agree = agree
+        self.history = collections.deque(maxlen=history)
+        self.rejects = 0
+        self.resets = 0
+        self._rejected = collections.deque(maxlen=max(0, agree - 1))
+        self.t = None
+        self._state = None
+        self._covariance = None
+        self._heading = 0.0
+        self._lock = threading.Lock()
+
+    def _predicted(self, t):
+        dt = max(0.0, t - self.t)
+        F = numpy.eye(4)
+        F[0, 2] = F[1, 3] = dt
+        G = numpy.array([[dt**2 / 2, 0], [0, dt**2 / 2], [dt, 0], [0, dt]])
+        Q = G @ G.T * self.acceleration**2
+        return F @ self._state, F @ self._covariance @ F.T + Q
+
+    def _reset(self, x, y, r):
+        self.resets += 1
+        self._state = numpy.array([x, y, 0.0, 0.0])
+        self._covariance = numpy.diag([r, r, self.max_speed**2, self.max_speed**2])
+
+    def predict(self, t):
+        """Estimate at time `t` or None before the first fix."""
+        with self._lock:
+            if self.t is None:
+                return None
+            state, covariance = self._predicted(t)
+            return Estimate(state[0], state[1], self._heading, covariance[:2, :2])
+
+    @property
+    def speed(self):
+        """Estimated speed in pixel/s, 0 before the first fix."""
+        with self._lock:
+            if self.t is None:
+                return 0.0
+            return math.hypot(self._state[2], self._state[3])
+
+    def _agrees(self, fix):
+        """Whether `fix` and the fixes rejected before it agree with each other."""
+        if len(self._rejected) < self.agree - 1:
+            return False
+        fixes = [*self._rejected, fix]
+        return all(
+            math.dist(a[1:3], b[1:3])
+            <= self.gate * math.sqrt(a[3] + b[3]) + self.max_speed * abs(b[0] - a[0])
+            for i, a in enumerate(fixes)
+            for b in fixes[i + 1 :]
+        )
+
+    def add_fix(self, t, x, y, heading, certainty):
+        """Fuse a position fix, returns False if it was rejected."""
+        r = (self.sigma / certainty) ** 2
+        w = min(certainty, 1.0)
+        with self._lock:
+            if self.t is None:
+                self._reset(x, y, r)
+                w = 1.0
+            else:
+                state, P = self._predicted(t)
+                innovation = numpy.array([x, y]) - state[:2]
+                S = P[:2, :2] + numpy.eye(2) * r
+                d2 = innovation @ numpy.linalg.solve(S, innovation)
+                if d2 <= self.gate**2:
+                    K = P[:, :2] @ numpy.linalg.inv(S)
+                    self._state = state + K @ innovation
+                    self._covariance = P - K @ P[:2, :]
+                elif (
+                    certainty >= 1
+                    or self.rejects >= self.max_rejects
+                    or self._agrees((t, x, y, r))
+                ):
+                    self._reset(x, y, r)
+                    w = 1.0
+                else:
+                    self.rejects += 1
+                    self._rejected.append((t, x, y, r))
+                    return False
+
+            self.rejects = 0
+            self._rejected.clear()
+            self.t = t
+            self._heading = math.atan2(
+                w * math.sin(heading) + (1 - w) * math.sin(self._heading),
+                w * math.cos(heading) + (1 - w) * math.cos(self._heading),
+            )
+            self.history.append((t, self._state[0], self._state[1]))
+            return True
+
+
+def search_box(sigma, min_size, max_size, sigmas=3, align=1):
+    """Size of the box to search for the player in.
+
+    `min_size` covers the area visible in the minimap, the box grows by
+    `sigmas` times the prediction error on each side and is rounded up to a
+    multiple of `align`.
+    """
+    box = min_size + 2 * sigmas * sigma
+    box = align * math.ceil(box / align)
+    return int(min(max(box, min_size), max_size))
@@ -0,0 +1,120 @@
+"""Estimate the transformation from minimap to map points.
+
+All estimators take Nx1x2 float32 source and destination points and return
+a 3x3 matrix or None. Select one with `source.minimap.transform.model`:
+
+homography
+    full perspective, 4 points per RANSAC sample
+affine_partial
+    rotation, uniform scale and translation, 2 points per sample
+rigid
+    rotation and translation at a known `scale`, 2 points per sample
+"""
+
+import math
+
+import cv2
+import numpy
+
+
+def homography(src, dst, threshold, max_iterations, confidence, scale=None):
+    M, mask = cv2.findHomography(
+        src, dst, cv2.RANSAC, threshold, None, max_iterations, confidence
+    )
+    return M
+
+
+def affine_partial(src, dst, threshold, max_iterations, confidence, scale=None):
+    M, mask = cv2.estimateAffinePartial2D(
+        src,
+        dst,
+        method=cv2.RANSAC,
+        ransacReprojThreshold=threshold,
+        maxIters=max_iterations,
+        confidence=confidence,
+    )
+    if M is None:
+        return None
+    return numpy.vstack([M, [0, 0, 1]])
+
+
+def _rigid_fit(src, dst, scale):
+    """Least squares rotation and translation of Nx2 points at `scale`."""
+    src_mean = src.mean(axis=0)
+    dst_mean = dst.mean(axis=0)
+    s = src - src_mean
+    d = dst - dst_mean
+    angle = math.atan2(
+        numpy.sum(s[:, 0] * d[:, 1] - s[:, 1] * d[:, 0]),
+        numpy.sum(s[:, 0] * d[:, 0] + s[:, 1] * d[:, 1]),
+    )
+    c, si = scale * math.cos(angle), scale * math.sin(angle)
+    R = numpy.array([[c, -si], [si, c]])
+    t = dst_mean - R @ src_mean
+    return numpy.array([[c, -si, t[0]], [si, c, t[1]], [0, 0, 1]])
+
+
+def rigid(src, dst, threshold, max_iterations, confidence, scale=1.0, batch=64):
+    """RANSAC over point pairs, each fixing rotation and translation.
+
+    Hypotheses are computed and scored `batch` at a time, until enough were
+    tried to find an outlier free pair with `confidence`. The best is
+    refined with a least squares fit to its inliers.
+    """
+    src = src.reshape(-1, 2).astype(numpy.float64)
+    dst = dst.reshape(-1, 2).astype(numpy.float64)
+    n = len(src)
+    if n < 2:
+        return None
+
+    rng = numpy.random.default_rng()
+    best = None
+    best_count = 0
+    needed = max_iterations
+    done = 0
+    while done < min(needed, max_iterations):
+        i = rng.integers(0, n, batch)
+        j = (i + rng.integers(1, n, batch)) % n  # a different point
+        ds = src[j] - src[i]
+        dd = dst[j] - dst[i]
+        angle = numpy.arctan2(dd[:, 1], dd[:, 0]) - numpy.arctan2(ds[:, 1], ds[:, 0])
+        c = scale * numpy.cos(angle)
+        s = scale * numpy.sin(angle)
+        tx = dst[i, 0] - (c * src[i, 0] - s * src[i, 1])
+        ty = dst[i, 1] - (s * src[i, 0] + c * src[i, 1])
+
+        # batch x n residuals
+        ex = c[:, None] * src[:, 0] - s[:, None] * src[:, 1] + tx[:, None] - dst[:, 0]
+        ey = s[:, None] * src[:, 0] + c[:, None] * src[:, 1] + ty[:, None] - dst[:, 1]
+        inliers = ex**2 + ey**2 < threshold**2
+        counts = inliers.sum(axis=1)
+        k = counts.argmax()
+        if counts[k] > best_count:
+            best_count = counts[k]
+            best = inliers[k]
+            w = best_count / n
+            if w >= 1:
+                break
+            needed = math.log(1 - confidence) / math.log(1 - w * w)
+        done += batch
+
+    if best_count < 2:
+        return None
+    return _rigid_fit(src[best], dst[best], scale)
+
+
+ESTIMATORS = {
+    "homography": (homography, 4),
+    "affine_partial": (affine_partial, 2),
+    "rigid": (rigid, 2),
+}
+
+
+def get_estimator(name):
+    """The estimator function and the points it needs at least."""
+    try:
+        return ESTIMATORS[name]
+    except KeyError:
+        raise ValueError(
+            "Unknown transform model, expecting one of", name, list(ESTIMATORS)
+        ) from None
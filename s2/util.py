@@ -2,6 +2,7 @@ import collections
 import collections.abc
 import logging
 import sys
+import threading
 from functools import cached_property
 
 import cv2
@@ -18,7 +19,12 @@ else:
 
 logger = logging.getLogger(__name__)
 
-Update = collections.namedtuple("Update", "position id")
+# `resets` changes when the position jumped and should not be animated
+Update = collections.namedtuple(
+    "Update", "position id covariance resets", defaults=[None, 0]
+)
+
+CANNY_THRESHOLDS = (100, 200)
 
 
 class IMG:
@@ -70,13 +76,101 @@ class IMG:
 
     @cached_property
     def edges(self):
-        return cv2.Canny(self.gray, 100, 200)
+        return cv2.Canny(self.gray, *CANNY_THRESHOLDS)
 
     @cached_property
     def photoimage(self):
         return PIL.ImageTk.PhotoImage(self.image)
 
 
+class LRUCache:
+    """Mapping that evicts the least recently used entries.
+
+    Holds at most `max_entries` entries whose `sizeof` sums up to at most
+    `max_bytes`. Either limit can be None. Counts hits, misses and evictions.
+    Can be used from several threads.
+    """
+
+    def __init__(self, max_entries=None, max_bytes=None, sizeof=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof or (lambda v: 0)
+        self._data = collections.OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value, size = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def __setitem__(self, key, value):
+        size = self.sizeof(value)
+        with self._lock:
+            if key in self._data:
+                self.bytes -= self._data.pop(key)[1]
+            self._data[key] = value, size
+            self.bytes += size
+            while self._data and (
+                (self.max_entries is not None and len(self._data) > self.max_entries)
+                or (self.max_bytes is not None and self.bytes > self.max_bytes)
+            ):
+                _, (_, size) = self._data.popitem(last=False)
+                self.bytes -= size
+                self.evictions += 1
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        return (
+            f"{len(self)} entries, {self.bytes} bytes, "
+            f"{self.hits} hits, {self.misses} misses, {self.evictions} evictions"
+        )
+
+
+class GridIndex:
+    """Items at points, found by a rectangle around them.
+
+    Points are sorted into square cells of `cell_size`, a query only looks
+    at the cells that overlap its rectangle.
+    """
+
+    def __init__(self, cell_size=256):
+        self.cell_size = cell_size
+        self._cells = collections.defaultdict(list)
+        self._count = 0
+
+    def add(self, x, y, item):
+        key = int(x // self.cell_size), int(y // self.cell_size)
+        self._cells[key].append((x, y, item))
+        self._count += 1
+
+    def query(self, left, top, right, bottom):
+        """Items with `left <= x < right` and `top <= y < bottom`."""
+        s = self.cell_size
+        for cy in range(int(top // s), int(bottom // s) + 1):
+            for cx in range(int(left // s), int(right // s) + 1):
+                for x, y, item in self._cells.get((cx, cy), ()):
+                    if left <= x < right and top <= y < bottom:
+                        yield item
+
+    def __len__(self):
+        return self._count
+
+
 def merge_recursive_dict(old, new):
     """Merge two dictionaries recursively.
 
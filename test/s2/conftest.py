@@ -0,0 +1,32 @@
+import pytest
+
+
+class FakeCanvas:
+    """Records the images of a `tkinter.Canvas`, all tagged "map"."""
+
+    def __init__(self):
+        self.items = {}  # item: ((x, y), image)
+        self.created = 0
+
+    def create_image(self, x, y, anchor, image, tags):
+        self.created += 1
+        self.items[self.created] = (x, y), image
+        return self.created
+
+    def move(self, tag, dx, dy):
+        for item, ((x, y), image) in self.items.items():
+            self.items[item] = (x + dx, y + dy), image
+
+    def delete(self, item):
+        del self.items[item]
+
+    def tag_lower(self, item):
+        pass
+
+    def positions(self):
+        return sorted(xy for xy, _ in self.items.values())
+
+
+@pytest.fixture
+def canvas():
+    return FakeCanvas()
@@ -0,0 +1,31 @@
+import numpy
+
+import s2.config
+from s2.cache import cached_array
+
+
+def test_cached_array(tmp_path, monkeypatch):
+    monkeypatch.setitem(s2.config._the_config, "cache", {"path": tmp_path / "cache"})
+    source = tmp_path / "source.png"
+    source.write_bytes(b"one")
+
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return numpy.arange(len(calls) * 3)
+
+    a = cached_array("test", source, dict(p=1), compute)
+    assert isinstance(a, numpy.memmap)
+    assert list(a) == [0, 1, 2]
+
+    cached_array("test", source, dict(p=1), compute)
+    assert len(calls) == 1
+
+    a = cached_array("test", source, dict(p=2), compute)
+    assert len(calls) == 2
+    assert len(a) == 6
+
+    source.write_bytes(b"changed")
+    cached_array("test", source, dict(p=2), compute)
+    assert len(calls) == 3
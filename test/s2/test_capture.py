@@ -0,0 +1,71 @@
+import numpy
+import PIL.Image
+import pytest
+
+from s2.capture import ReplayBackend, ReplayFinished, _Buffers
+
+
+def test_buffers_round_robin():
+    b = _Buffers(2)
+    one = b.next((2, 3))
+    two = b.next((2, 3))
+    assert one is not two
+    assert b.next((2, 3)) is one
+    assert b.next((4, 3)).shape == (4, 3)
+
+
+def test_buffers_per_shape():
+    b = _Buffers(2, shapes=2)
+    first = [b.next((2, 3)), b.next((4, 3))]
+    second = [b.next((2, 3)), b.next((4, 3))]
+    assert first[0] is not second[0] and first[1] is not second[1]
+    assert b.next((2, 3)) is first[0]
+    assert b.next((4, 3)) is first[1]
+
+    b.next((5, 3))  # drops the least recently used shape
+    assert b.next((2, 3)) is not second[0]
+
+
+def test_replay_directory(tmp_path):
+    for i in range(2):
+        rgb = numpy.full((20, 30, 3), i, numpy.uint8)
+        PIL.Image.fromarray(rgb).save(tmp_path / f"{i}.png")
+
+    r = ReplayBackend(tmp_path)
+    img = r.grab((5, 10, 15, 20))
+    assert (img.width, img.height) == (10, 10)
+    assert img.rgb[0, 0, 0] == 0
+    assert r.grab(same_frame=True).rgb[0, 0, 0] == 0
+    assert r.grab().rgb[0, 0, 0] == 1
+    with pytest.raises(ReplayFinished):
+        r.grab()
+
+
+def test_replay_recorded_speed(tmp_path, monkeypatch):
+    for i in range(3):
+        PIL.Image.new("RGB", (4, 4)).save(tmp_path / f"{i}.png")
+    sleeps = []
+    monkeypatch.setattr("time.sleep", sleeps.append)
+
+    r = ReplayBackend(tmp_path, speed="recorded", fps=10)
+    for i in range(3):
+        r.grab()
+
+    # sleep does not pass time here, so the delays add up
+    assert sleeps == pytest.approx([0.1, 0.2], abs=0.05)
+
+
+@pytest.mark.parametrize("speed", ["max", "recorded"])
+def test_replay_time_is_recorded_time(tmp_path, monkeypatch, speed):
+    for i in range(3):
+        PIL.Image.new("RGB", (4, 4)).save(tmp_path / f"{i}.png")
+    monkeypatch.setattr("time.sleep", lambda d: None)
+
+    r = ReplayBackend(tmp_path, speed=speed, fps=10)
+    times = []
+    for i in range(3):
+        r.grab()
+        r.grab((0, 0, 2, 2), same_frame=True)
+        times.append(r.time())
+
+    assert times == pytest.approx([0, 0.1, 0.2])
@@ -0,0 +1,73 @@
+import numpy
+import pytest
+
+from s2.feature_index import FeatureIndex, MapFeatures, strongest_per_bin
+
+
+def make_index(bin_size=64):
+    rng = numpy.random.default_rng(1)
+    points = rng.uniform(0, [300, 200], (500, 2)).astype(numpy.float32)
+    descriptors = numpy.arange(500, dtype=numpy.int32).reshape(-1, 1)
+    features = MapFeatures(points, descriptors)
+    return features, FeatureIndex.from_features(features, (200, 300), bin_size)
+
+
+def test_lookup_matches_brute_force():
+    features, index = make_index()
+    slices = slice(30, 150), slice(-10, 170)
+
+    found = index.lookup(slices)
+
+    x, y = features.points.T
+    inside = (0 <= x) & (x < 170) & (30 <= y) & (y < 150)
+    expected = sorted(map(tuple, features.points[inside] - numpy.float32([-10, 30])))
+
+    assert sorted(map(tuple, found.points)) == expected
+    # descriptors still belong to their points
+    for p, d in zip(found.points, found.descriptors):
+        assert tuple(features.points[d[0]] - numpy.float32([-10, 30])) == tuple(p)
+
+
+def test_lookup_outside():
+    features, index = make_index()
+    found = index.lookup((slice(-100, -10), slice(0, 100)))
+    assert len(found.points) == 0
+    found = index.lookup((slice(250, 300), slice(0, 100)))
+    assert len(found.points) == 0
+
+
+def test_save_load(tmp_path):
+    features, index = make_index(32)
+    p = tmp_path / "index"
+    index.save(p)
+    loaded = FeatureIndex.load(p)
+
+    assert loaded.bin_size == 32
+    slices = slice(0, 200), slice(0, 300)
+    assert len(loaded.lookup(slices).points) == 500
+
+
+def test_load_interrupted_save(tmp_path, monkeypatch):
+    features, index = make_index(32)
+    p = tmp_path / "index"
+    index.save(p)
+
+    def interrupted(path, array):
+        path.write_bytes(b"\x93NUMPY")
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(numpy, "save", interrupted)
+    with pytest.raises(KeyboardInterrupt):
+        index.save(p)
+
+    with pytest.raises(FileNotFoundError):
+        FeatureIndex.load(p)
+
+
+def test_strongest_per_bin():
+    points = numpy.float32([[1, 1], [2, 2], [3, 3], [70, 1], [1, 70], [2, 70]])
+    responses = numpy.float32([0.1, 0.3, 0.2, 0.1, 0.5, 0.4])
+
+    keep = strongest_per_bin(points, responses, 64, 2)
+
+    assert keep.tolist() == [1, 2, 3, 4, 5]
@@ -0,0 +1,66 @@
+import copy
+import types
+
+import numpy
+import PIL.Image
+import pytest
+
+import s2.config
+from s2 import get_image
+from s2.capture import MSSBackend, PILBackend, _Buffers
+
+
+class FakeMSS:
+    monitors = [dict(left=0, top=0, width=40, height=30)]
+
+    def __init__(self):
+        self.grabbed = []
+
+    def grab(self, monitor):
+        self.grabbed.append(monitor)
+        bgra = numpy.zeros((monitor["height"], monitor["width"], 4), numpy.uint8)
+        bgra[..., 2] = 255  # red
+        return types.SimpleNamespace(
+            raw=bgra.tobytes(), width=monitor["width"], height=monitor["height"]
+        )
+
+
+@pytest.fixture
+def config(monkeypatch):
+    """Default config on a platform without windows to look for."""
+    monkeypatch.setattr("sys.platform", "linux")
+    config = copy.deepcopy(s2.config.DEFAULT_CONFIG)
+    monkeypatch.setattr(s2.config, "_the_config", config)
+    return config
+
+
+def test_mss_backend_without_windows(config, monkeypatch):
+    backend = MSSBackend.__new__(MSSBackend)
+    backend.sct = FakeMSS()
+    backend.buffers = _Buffers()
+    monkeypatch.setattr(get_image, "_backend", backend)
+    config["get_image"]["region"] = (100, 50, 1380, 770)
+
+    img = get_image.get_image((10, 20, 30, 25))
+
+    assert backend.sct.grabbed == [dict(left=110, top=70, width=20, height=5)]
+    assert (img.width, img.height) == (20, 5)
+    assert (img.rgb[0, 0] == [255, 0, 0]).all()
+
+    config["get_image"]["region"] = ()
+    assert get_image.get_image().width == 40
+
+
+def test_pil_backend_without_windows(config, monkeypatch):
+    boxes = []
+
+    def grab(box, all_screens):
+        boxes.append(box)
+        return PIL.Image.new("RGB", (8, 6))
+
+    monkeypatch.setattr("PIL.ImageGrab.grab", grab)
+    monkeypatch.setattr(get_image, "_backend", PILBackend())
+
+    assert get_image.get_image().width == 8
+    get_image.get_image((1, 2, 3, 4))
+    assert boxes == [None, (1, 2, 3, 4)]
@@ -0,0 +1,88 @@
+import math
+import types
+
+import pytest
+
+from s2.coords import RelativePosition
+from s2.gui import GUI, Motion, PoiLayer
+from s2.pipeline import LatestQueue
+from s2.pois import PointOfInterest
+
+
+def poi(x, y):
+    return PointOfInterest(RelativePosition(x, y, 0, "mapTest"), "test")
+
+
+def test_poi_layer_only_draws_pois_in_view(canvas):
+    layer = PoiLayer(canvas, "mapTest", cell_size=100, margin=10, icon=str)
+    for x, y in [(-5, 50), (50, 50), (150, 50), (395, 50), (1000, 1000)]:
+        layer.add(poi(x, y))
+
+    # the icon of the first reaches into the view
+    layer.show(1, 0, 0, 200, 200)
+    assert canvas.positions() == [(-5, 50), (50, 50), (150, 50)]
+
+    canvas.move("map", -200, 0)
+    layer.show(1, 200, 0, 200, 200)
+    assert canvas.positions() == [(195, 50)]
+
+    layer.show(0.5, 0, 0, 200, 200)
+    assert canvas.positions() == [(-2, 25), (25, 25), (75, 25), (198, 25)]
+    assert canvas.created == 8  # all new at the new scale
+
+
+def test_poll_takes_latest_update():
+    received = []
+    scheduled = []
+    gui = types.SimpleNamespace(
+        root=types.SimpleNamespace(after=lambda *args: scheduled.append(args)),
+        mailbox=LatestQueue(1),
+        frame_interval=16,
+        rendered=0,
+        update=lambda u, t: received.append(u),
+        motion=Motion(),
+        shown_position=None,
+    )
+    gui.poll = lambda: None
+    for u in range(5):
+        GUI.send_update(gui, u)
+    GUI.poll(gui)
+    GUI.poll(gui)
+
+    assert received == [4]
+    assert (gui.rendered, gui.mailbox.dropped) == (1, 4)
+    assert scheduled == [(16, gui.poll)] * 2
+
+
+def position(x, y, heading=0):
+    return RelativePosition(x, y, heading, "mapTest")
+
+
+def test_motion_interpolates_one_update_behind():
+    motion = Motion(snap=100)
+    assert motion.at(0) is None
+
+    motion.add(1.0, position(10, 20, 3.0))
+    assert motion.at(1.5) == position(10, 20, 3.0)
+
+    motion.add(2.0, position(20, 10, -3.0))
+    assert motion.at(2.0) == position(10, 20, 3.0)
+    p = motion.at(2.5)
+    assert (p.x, p.y) == pytest.approx((15, 15))
+    assert abs(p.heading) == pytest.approx(math.pi)  # turned the short way
+    assert motion.at(10)[:2] == pytest.approx((20, 10))  # not extrapolated
+
+    # from where it was drawn
+    motion.add(2.5, position(30, 10))
+    assert motion.at(2.5)[:2] == pytest.approx((15, 15))
+    assert motion.at(3.0)[:2] == pytest.approx((30, 10))
+
+
+def test_motion_snaps_on_jumps():
+    motion = Motion(snap=100)
+    motion.add(1.0, position(10, 20))
+    motion.add(2.0, position(500, 20))
+    assert motion.at(2.0) == position(500, 20)
+
+    motion.add(3.0, position(510, 20), resets=1)
+    assert motion.at(3.0) == position(510, 20)
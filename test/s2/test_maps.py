@@ -0,0 +1,21 @@
+import numpy
+import PIL.Image
+
+import s2.config
+from s2.maps import load_map_edges, load_map_image
+
+
+def test_load_map(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setitem(s2.config._the_config, "cache", {"path": tmp_path / "cache"})
+    rgb = numpy.zeros((64, 128, 3), numpy.uint8)
+    rgb[20:40, 30:90] = 255
+    PIL.Image.fromarray(rgb).save("mapTest.png")
+
+    img = load_map_image("mapTest")
+    assert isinstance(img.rgb, numpy.memmap)
+    assert (img.width, img.height) == (128, 64)
+    assert (img.rgb == rgb).all()
+
+    assert load_map_edges("mapTest").shape == (64, 128)
+    assert load_map_edges("mapTest", level=1).shape == (32, 64)
@@ -0,0 +1,117 @@
+import numpy
+import pytest
+
+import s2.config
+from s2.matcher import (
+    MATCHERS,
+    BruteForceMatcher,
+    create_matcher,
+    match_two_pass,
+    ratio_test,
+)
+
+
+@pytest.mark.parametrize("name", list(MATCHERS))
+def test_matcher_finds_same_descriptors(name):
+    rng = numpy.random.default_rng(2)
+    descriptors = rng.integers(0, 256, (300, 61), dtype=numpy.uint8)
+    query = descriptors[[5, 17, 250]]
+
+    matcher = create_matcher(name, descriptors)
+    indices, distances = matcher.knn_match(query, 2)
+
+    assert indices[:, 0].tolist() == [5, 17, 250]
+    assert distances[:, 0].tolist() == [0, 0, 0]
+
+
+def test_unknown_matcher():
+    with pytest.raises(ValueError):
+        create_matcher("nope", None)
+
+
+@pytest.mark.parametrize("name", list(MATCHERS))
+def test_matcher_within(name):
+    rng = numpy.random.default_rng(2)
+    descriptors = rng.integers(0, 256, (300, 61), dtype=numpy.uint8)
+    query = descriptors[[5, 17, 250]]
+    within = numpy.arange(100, 300)
+
+    matcher = create_matcher(name, descriptors)
+    indices, distances = matcher.knn_match_within(query, within, 2)
+
+    assert indices[2, 0] == 250
+    assert set(indices[indices >= 0].tolist()) <= set(within.tolist())
+    assert distances[:2, 0].min() > 0
+
+
+class CountingMatcher(BruteForceMatcher):
+    comparisons = 0
+
+    def knn_match(self, query, k=2):
+        self.comparisons += len(query) * len(self.descriptors)
+        return super().knn_match(query, k)
+
+    def knn_match_within(self, query, within, k=2):
+        self.comparisons += len(query) * len(within)
+        return super().knn_match_within(query, within, k)
+
+
+def cell(size, rng):
+    """Map points of a cell of `size`, and the minimap at its center."""
+    points = rng.uniform(0, size, (size**2 // 100, 2)).astype(numpy.float32)
+    descriptors = rng.integers(0, 256, (len(points), 61), dtype=numpy.uint8)
+    near = numpy.flatnonzero(numpy.hypot(*(points - size / 2).T) < 80)
+    return points, descriptors, near
+
+
+def test_match_two_pass():
+    rng = numpy.random.default_rng(3)
+    points, descriptors, near = cell(1000, rng)
+    query = descriptors[near]
+    responses = rng.uniform(size=len(near))
+
+    matcher = CountingMatcher(descriptors)
+    good = match_two_pass(matcher, points, query, responses, 40, 96, 1000**2)
+
+    assert good.query.tolist() == list(range(len(near)))
+    assert good.train.tolist() == near.tolist()
+    assert matcher.comparisons < len(query) * len(points) / 4
+
+
+@pytest.mark.parametrize("size", [160, 224, 512])
+def test_match_two_pass_compares_less(size):
+    config = s2.config.DEFAULT_CONFIG["source"]["minimap"]
+    radius = 80 * config["transform"]["scale"] + config["two_pass"]["margin"]
+    rng = numpy.random.default_rng(4)
+    points, descriptors, near = cell(size, rng)
+    query = descriptors[near]
+    responses = rng.uniform(size=len(near))
+
+    matcher = CountingMatcher(descriptors)
+    good = match_two_pass(
+        matcher,
+        points,
+        query,
+        responses,
+        config["two_pass"]["keypoints"],
+        radius,
+        size**2,
+    )
+
+    assert good.train.tolist() == near.tolist()
+    single_pass = len(query) * len(points)
+    assert matcher.comparisons <= single_pass
+    if size == 512:
+        assert matcher.comparisons < single_pass / 2
+
+
+def test_ratio_test():
+    indices = numpy.array([[1, 2], [3, 4], [5, -1]])
+    distances = numpy.array([[10, 100], [90, 100], [0, 0]])
+
+    good = ratio_test(indices, distances)
+
+    assert good.query.tolist() == [0]
+    assert good.train.tolist() == [1]
+    assert good.distance.tolist() == [10]
+    assert [(m.queryIdx, m.trainIdx) for m in good.dmatches()] == [(0, 1)]
@@ -0,0 +1,49 @@
+import json
+import urllib.request
+
+import pytest
+
+from s2.metrics import Histogram, Metrics, Monitor
+
+
+def test_histogram_percentiles():
+    h = Histogram()
+    for ms in range(1, 101):
+        h.add(ms / 1000)
+    assert h.count == 100
+    assert h.percentile(50) == pytest.approx(0.050, rel=0.2)
+    assert h.percentile(99) == pytest.approx(0.099, rel=0.2)
+    assert h.percentile(100) == 0.1
+    s = h.summary()
+    assert s["mean"] == pytest.approx(50.5)
+    assert s["p50"] <= s["p95"] <= s["p99"] <= s["max"]
+
+
+def test_metrics_rate_and_timer(monkeypatch):
+    m = Metrics()
+    now = iter([0.0, 0.1, 0.2, 0.3, 0.4])
+    monkeypatch.setattr("s2.metrics.time.monotonic", lambda: next(now))
+    for _ in range(5):
+        m.count("frames")
+    assert m.rate("frames") == pytest.approx(10)
+    assert m.rate("fixes") == 0
+
+    with m.timer("capture"):
+        pass
+    assert m.histograms["capture"].count == 1
+
+
+def test_monitor(tmp_path):
+    m = Metrics()
+    m.add("capture", 0.002)
+    dump = tmp_path / "metrics.json"
+    monitor = Monitor(m, 0, "127.0.0.1:0", dump)
+    monitor.start()
+    try:
+        host, port = monitor.server.server_address
+        with urllib.request.urlopen(f"http://{host}:{port}/", timeout=5) as r:
+            served = json.load(r)
+    finally:
+        monitor.stop()
+    assert served["latency_ms"]["capture"]["count"] == 1
+    assert json.loads(dump.read_text())["latency_ms"]["capture"]["count"] == 1
@@ -0,0 +1,49 @@
+import pytest
+
+from s2.pacing import FramePacer
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [100.0]
+    sleeps = []
+
+    def sleep(d):
+        sleeps.append(d)
+        now[0] += d
+
+    monkeypatch.setattr("s2.pacing.time.monotonic", lambda: now[0])
+    monkeypatch.setattr("s2.pacing.time.sleep", sleep)
+    return sleeps
+
+
+def test_pacer_ramps_up_with_speed(clock):
+    p = FramePacer(fps=20, max_fps=40, fast_speed=100, max_idle_interval=1)
+    p.wait()
+    p.found(0)
+    p.wait()
+    p.found(50)
+    p.wait()
+    p.found(500)
+    p.wait()
+    assert clock == pytest.approx([1 / 20, 1 / 30, 1 / 40])
+
+
+def test_pacer_backs_off_while_idle(clock):
+    p = FramePacer(fps=20, max_fps=40, fast_speed=100, max_idle_interval=0.5)
+    p.wait()
+    for _ in range(6):
+        p.missed()
+        p.wait()
+    assert clock == pytest.approx([0.05, 0.1, 0.2, 0.4, 0.5, 0.5])
+    p.found(0)
+    p.wait()
+    assert clock[-1] == pytest.approx(0.05)
+
+
+def test_pacer_unlimited(clock):
+    p = FramePacer(fps=0, max_fps=0, fast_speed=100, max_idle_interval=1)
+    p.wait()
+    p.found(100)
+    p.wait()
+    assert clock == []
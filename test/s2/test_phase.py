@@ -0,0 +1,63 @@
+import math
+
+import cv2
+import numpy
+import pytest
+
+from s2.phase import PhaseTracker
+
+
+@pytest.fixture(scope="module")
+def world():
+    rng = numpy.random.default_rng(2)
+    image = numpy.zeros((800, 800), numpy.uint8)
+    for _ in range(300):
+        x, y = rng.integers(0, 800, 2)
+        w, h = rng.integers(5, 60, 2)
+        cv2.rectangle(image, (x, y), (x + w, y + h), int(rng.integers(0, 256)), -1)
+    return cv2.GaussianBlur(image, (5, 5), 1)
+
+
+def minimap_transform(i):
+    """Minimap to world transform of frame `i`."""
+    a = math.radians(2 * i)
+    c, s = math.cos(a), math.sin(a)
+    x, y = 300 + 6 * i, 300 + 3 * i
+    R = numpy.array([[c, -s, 0], [s, c, 0], [0, 0, 1]])
+    return (
+        numpy.array([[1, 0, x], [0, 1, y], [0, 0, 1]])
+        @ R
+        @ numpy.array([[1, 0, -80], [0, 1, -80], [0, 0, 1]])
+    )
+
+
+def minimap(world, i):
+    M = minimap_transform(i)
+    return cv2.warpAffine(
+        world, M[:2], (160, 160), flags=cv2.WARP_INVERSE_MAP | cv2.INTER_LINEAR
+    )
+
+
+def test_track_follows_motion(world):
+    tracker = PhaseTracker(max_frames=3)
+    tracker.reset(minimap(world, 0), minimap_transform(0))
+
+    for i in range(1, 4):
+        M = tracker.track(minimap(world, i))
+        expected = minimap_transform(i)
+        assert M @ [80, 80, 1] == pytest.approx(expected @ [80, 80, 1], abs=1.5)
+        assert math.atan2(M[1, 0], M[0, 0]) == pytest.approx(
+            math.atan2(expected[1, 0], expected[0, 0]), abs=math.radians(0.5)
+        )
+
+    assert tracker.track(minimap(world, 4)) is None
+
+
+def test_track_gives_up_on_unrelated_image(world):
+    tracker = PhaseTracker()
+    assert tracker.track(minimap(world, 0)) is None
+
+    tracker.reset(minimap(world, 0), minimap_transform(0))
+    noise = numpy.random.default_rng(3).integers(0, 256, (160, 160), numpy.uint8)
+    assert tracker.track(noise) is None
+    assert tracker.track(minimap(world, 1)) is None
@@ -0,0 +1,113 @@
+import copy
+
+import numpy
+import pytest
+
+import s2.config
+from s2 import position_updater
+from s2.coords import RelativePosition
+from s2.metrics import Metrics
+from s2.position_updater import Frame
+from s2.util import IMG
+
+
+@pytest.fixture
+def updater(monkeypatch):
+    config = copy.deepcopy(s2.config.DEFAULT_CONFIG)
+    config["source"]["minimap"]["phase"]["enabled"] = False
+    monkeypatch.setattr(s2.config, "_the_config", config)
+    return position_updater.create(config, lambda u: None)
+
+
+def run(updater, located, relocalized=()):
+    """Match and validate a frame per position in `located`, 30 per second.
+
+    Returns the failures before each relocalization.
+    """
+    relocalized = iter(relocalized)
+    failures = []
+
+    def relocalize(frame):
+        failures.append(updater.failures)
+        return next(relocalized, None)
+
+    updater.relocalize = relocalize
+    t = updater.tracker.t or 0
+    for i, position in enumerate(located, 1):
+        updater.locate = lambda frame, features, slices: position
+        frame = Frame(None, (1920, 1080), updater.map_name)
+        frame.time = t + i / 30
+        updater.validate(updater.match(frame))
+    return failures
+
+
+def at(x, y):
+    return RelativePosition(x, y, 0, "map4096x4096")
+
+
+def test_relocalize_after_rejected_fixes(updater):
+    run(updater, [at(600 + i, 600) for i in range(5)])
+    assert updater.failures == 0
+
+    # teleported, matches where the player was expected are rejected
+    wrong = [at(900, 100), at(100, 900)] * 3
+    assert run(updater, wrong, [at(1500, 1400)]) == [5]
+    assert updater.search_area(0)[:2] == (1500, 1400)
+
+    # found where the relocalization said
+    run(updater, [at(1500 + 4 * i, 1400) for i in range(1, 4)])
+    assert updater.candidate is None
+    assert updater.failures == 0
+    assert updater.tracker.predict(updater.tracker.t)[:2] == pytest.approx(
+        (1512, 1400), abs=2
+    )
+
+
+def test_failed_relocalization_backs_off(updater):
+    run(updater, [at(600, 600)])
+    assert run(updater, [None] * 40) == [5, 16, 37]
+
+
+def test_timings_of_frames_without_features(updater, monkeypatch):
+    metrics = Metrics()
+    monkeypatch.setattr(position_updater, "METRICS", metrics)
+    blank = IMG.from_rgb(numpy.zeros((160, 160, 3), numpy.uint8))
+    frame = Frame(blank, (1920, 1080), updater.map_name)
+
+    frame = updater.analyze(frame)
+    assert frame.descriptors is None
+    assert updater.lookup(frame) is None
+    assert metrics.histograms["features"].count == 1
+
+
+def test_backs_off_without_minimap_or_map(updater, monkeypatch):
+    blank = IMG.from_rgb(numpy.zeros((160, 160, 3), numpy.uint8))
+    monkeypatch.setattr(position_updater, "get_image", lambda *a, **k: blank)
+    monkeypatch.setattr(position_updater.s2.parse_map, "parse_map_area", lambda m: None)
+    monkeypatch.setattr(updater.pacer, "wait", lambda: None)
+    updater.get_minimap_arrow = lambda img: None
+
+    intervals = []
+    for _ in range(3):
+        updater.update()
+        intervals.append(updater.pacer.interval)
+
+    assert updater.pacer.misses == 3
+    assert intervals == sorted(intervals) and intervals[0] < intervals[-1]
+
+
+def test_shared_memory_outlives_stop(updater, monkeypatch):
+    monkeypatch.setitem(s2.config._the_config["source"], "pipeline", False)
+    updater.init = True
+    shared = []
+
+    def update():
+        ring = updater._ring((4, 4, 3))
+        updater.stop()  # from the GUI thread, while a frame is shared
+        shared.append(ring.put(numpy.ones((4, 4, 3), numpy.uint8)).get().sum())
+
+    updater.update = update
+    updater.run()
+
+    assert shared == [48]
+    assert updater._rings == {}
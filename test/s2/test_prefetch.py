@@ -0,0 +1,43 @@
+import math
+import threading
+
+from pytest import approx
+
+from s2.prefetch import Prefetcher, predict_path
+from s2.util import LRUCache
+
+
+def test_predict_path_velocity():
+    history = [(0.0, 0, 0), (1.0, 10, 20)]
+    path = predict_path(history, 0, 2.0, 8)
+    assert path[-1] == approx((30, 60))
+    assert len(path) == math.ceil(math.hypot(20, 40) / 8)
+
+
+def test_predict_path_heading():
+    history = [(0.0, 100, 100)]
+    (point,) = predict_path(history, math.pi / 2, 1.0, 32)
+    assert point == approx((132, 100))
+
+
+def test_prefetcher():
+    cache = LRUCache()
+    cache["known"] = "old"
+    done = threading.Event()
+
+    def compute(key, detector):
+        if key == "b":
+            done.set()
+        return key, detector
+
+    p = Prefetcher(cache, compute, lambda: "detector")
+    p.start()
+    p.request(["known", "a", "b"])
+    assert done.wait(5)
+    p.stop()
+    p.join()
+
+    assert cache.get("known") == "old"
+    assert cache.get("a") == ("a", "detector")
+    assert cache.get("b") == ("b", "detector")
+    assert p.prefetched == 2
@@ -0,0 +1,28 @@
+from s2.coords import RelativePosition
+from s2.replay import load_track, percentile, report
+
+
+def test_load_track(tmp_path):
+    p = tmp_path / "track"
+    p.write_text("# index,position\n0,map4096x4096:1:2:0\n\n5,map2048x2048:3:4:0.5\n")
+
+    track = load_track(p)
+
+    assert track == {
+        0: RelativePosition(1, 2, 0, "map4096x4096"),
+        5: RelativePosition(3, 4, 0.5, "map2048x2048"),
+    }
+
+
+def test_percentile():
+    values = list(range(100, 0, -1))
+    assert percentile(values, 50) == 51
+    assert percentile(values, 95) == 96
+    assert percentile(values, 100) == 100
+
+
+def test_report_counts_frames_without_fix(capsys):
+    report(dict(frames=4, fixes=2, fps=30, times={}, errors=[1.0, 3.0], missed=2))
+    out = capsys.readouterr().out.splitlines()
+    assert out[-2].startswith("position error over 2 fixes: mean 2.0")
+    assert out[-1] == "2 frames with a known position without a fix"
@@ -0,0 +1,54 @@
+import numpy
+import PIL.Image
+import pytest
+
+import s2.config
+from s2.tiles import TileLayer, TilePyramid, tile_keys
+
+
+def test_tile_keys():
+    assert tile_keys(0, (0, 0, 100, 100), 256, (1024, 1024)) == {(0, 0, 0)}
+    assert tile_keys(1, (250, 0, 300, 10), 256, (1024, 1024)) == {(1, 0, 0), (1, 1, 0)}
+    # clipped to the map
+    assert tile_keys(0, (-500, 900, 100, 2000), 256, (1024, 600), margin=1) == {
+        (0, 0, 2),
+        (0, 0, 3),
+        (0, 1, 2),
+        (0, 1, 3),
+    }
+
+
+@pytest.fixture
+def pyramid(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setitem(s2.config._the_config, "cache", {"path": tmp_path / "cache"})
+    rgb = numpy.zeros((512, 1024, 3), numpy.uint8)
+    rgb[:, 512:] = 200
+    PIL.Image.fromarray(rgb).save("mapTest.png")
+    return TilePyramid("mapTest", size=128, levels=3)
+
+
+def test_pyramid_tiles(pyramid):
+    assert pyramid.shape(1) == (256, 512)
+    assert pyramid.tile((0, 7, 3)).shape == (128, 128, 3)
+    assert (pyramid.tile((1, 0, 0)) == 0).all()
+    assert (pyramid.tile((1, 3, 1)) == 200).all()
+
+
+def test_layer_shows_tiles_in_view(pyramid, canvas):
+    layer = TileLayer(canvas, pyramid, cache_size=2, margin=0, photoimage=id)
+
+    layer.show(0, 100, 0, 200, 100)
+    assert set(layer.items) == {(0, 0, 0), (0, 1, 0), (0, 2, 0)}
+    assert canvas.positions() == [(-100, 0), (28, 0), (156, 0)]
+
+    canvas.move("map", -200, 0)
+    layer.show(0, 300, 0, 200, 100)
+    assert set(layer.items) == {(0, 2, 0), (0, 3, 0)}
+    assert canvas.positions() == [(-44, 0), (84, 0)]
+    assert len(layer.cache) == 2
+
+    canvas.move("map", 200, 0)
+    layer.show(0, 100, 0, 200, 100)
+    assert layer.cache.hits == 1
+    assert canvas.created == 6
@@ -0,0 +1,76 @@
+from pytest import approx
+
+from s2.tracking import KalmanTracker, search_box
+
+
+def make_tracker():
+    return KalmanTracker(sigma=2, acceleration=10, max_speed=100, max_rejects=2)
+
+
+def test_tracker_follows_constant_velocity():
+    t = make_tracker()
+    assert t.predict(0) is None
+
+    for i in range(20):
+        assert t.add_fix(i / 10, 100 + i, 200 - 2 * i, 0.5, 0.5)
+
+    e = t.predict(2.5)
+    assert e.x == approx(125, abs=0.5)
+    assert e.y == approx(150, abs=1)
+    assert e.heading == approx(0.5)
+    assert e.sigma < 4
+    assert t.predict(10).sigma > e.sigma
+
+
+def test_tracker_rejects_outliers():
+    t = make_tracker()
+    t.add_fix(0, 100, 100, 0, 1)
+    t.add_fix(0.1, 100, 100, 0, 1)
+
+    assert not t.add_fix(0.2, 300, 100, 0, 0.5)
+    assert not t.add_fix(0.3, 300, 100, 0, 0.5)
+    assert t.predict(0.3).x == approx(100, abs=1)
+
+    # teleported
+    assert t.add_fix(0.4, 300, 100, 0, 0.5)
+    assert t.predict(0.4).x == 300
+
+
+def test_tracker_follows_jump_once_fixes_agree():
+    t = KalmanTracker(sigma=2, acceleration=10, max_speed=100, max_rejects=10, agree=3)
+    for i in range(5):
+        t.add_fix(i / 10, 100, 100, 0, 0.5)
+
+    # outliers that do not agree with each other
+    assert not t.add_fix(0.5, 800, 100, 0, 0.5)
+    assert not t.add_fix(0.6, 100, 800, 0, 0.5)
+    assert not t.add_fix(0.7, 800, 100, 0, 0.5)
+    assert t.predict(0.7).x == approx(100, abs=1)
+
+    # teleported, the third fix that agrees is taken
+    assert not t.add_fix(0.8, 500, 500, 0, 0.5)
+    assert not t.add_fix(0.9, 503, 498, 0, 0.5)
+    assert t.add_fix(1.0, 506, 496, 0, 0.5)
+    assert t.predict(1.0)[:2] == approx((506, 496))
+    assert t.rejects == 0
+
+
+def test_tracker_accepts_certain_fixes():
+    t = make_tracker()
+    t.add_fix(0, 100, 100, 0, 1)
+    assert t.add_fix(0.1, 500, 100, 0, 1)
+    assert t.predict(0.1).x == 500
+
+
+def test_search_box():
+    assert search_box(0, 160, 512, align=32) == 160
+    assert search_box(10, 160, 512, align=32) == 224
+    assert search_box(1000, 160, 512, align=32) == 512
+
+
+def test_tracker_speed():
+    t = make_tracker()
+    assert t.speed == 0
+    for i in range(20):
+        t.add_fix(i / 10, 3 * i, 4 * i, 0, 1)
+    assert t.speed == approx(50, rel=0.1)
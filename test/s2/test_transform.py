@@ -0,0 +1,49 @@
+import math
+
+import numpy
+import pytest
+
+from s2.transform import ESTIMATORS, get_estimator
+
+
+def make_points(angle, translation, n=40, outliers=10):
+    rng = numpy.random.default_rng(4)
+    src = rng.uniform(0, 160, (n, 2))
+    c, s = math.cos(angle), math.sin(angle)
+    dst = src @ numpy.array([[c, s], [-s, c]]) + translation
+    dst[:outliers] = rng.uniform(0, 500, (outliers, 2))
+    return (
+        src.astype(numpy.float32).reshape(-1, 1, 2),
+        dst.astype(numpy.float32).reshape(-1, 1, 2),
+    )
+
+
+@pytest.mark.parametrize("name", list(ESTIMATORS))
+def test_estimators_find_rotation_and_translation(name):
+    src, dst = make_points(0.3, [200, 100])
+    estimate, min_points = get_estimator(name)
+
+    M = estimate(src, dst, 2.0, 1000, 0.999, scale=1.0)
+
+    assert M.shape == (3, 3)
+    assert -math.atan2(M[0, 1], M[0, 0]) == pytest.approx(0.3, abs=1e-3)
+    p = M @ [80, 80, 1]
+    assert p[:2] / p[2] == pytest.approx(
+        [
+            80 * math.cos(0.3) - 80 * math.sin(0.3) + 200,
+            80 * math.sin(0.3) + 80 * math.cos(0.3) + 100,
+        ],
+        abs=0.05,
+    )
+    assert min_points <= 4
+
+
+def test_rigid_needs_two_points():
+    estimate, _ = get_estimator("rigid")
+    src, dst = make_points(0, [0, 0], n=1, outliers=0)
+    assert estimate(src, dst, 2.0, 100, 0.999) is None
+
+
+def test_unknown_estimator():
+    with pytest.raises(ValueError):
+        get_estimator("nope")
@@ -1,6 +1,6 @@
 import pytest
 
-from s2.util import merge_recursive_dict
+from s2.util import GridIndex, LRUCache, merge_recursive_dict
 
 # Merge dict
 
@@ -40,3 +40,47 @@ def test_merge_dict_recursive():
 def test_merge_dict_type_mismatch():
     with pytest.raises(TypeError):
         merge_recursive_dict(dict(a=1), dict(a={}))
+
+
+# LRU Cache
+
+
+def test_lru_cache_entries():
+    c = LRUCache(max_entries=2)
+    c[1] = "a"
+    c[2] = "b"
+    assert c.get(1) == "a"
+    c[3] = "c"
+
+    assert 2 not in c
+    assert c.get(2) is None
+    assert c.get(1) == "a"
+    assert c.get(3) == "c"
+    assert (c.hits, c.misses, c.evictions) == (3, 1, 1)
+
+
+def test_lru_cache_bytes():
+    c = LRUCache(max_bytes=10, sizeof=len)
+    c[1] = "aaaa"
+    c[2] = "bbbb"
+    c[1] = "aaaaaa"
+    assert c.bytes == 10
+    c[3] = "c"
+    assert 2 not in c
+    assert 1 in c
+    assert c.bytes == 7
+    assert len(c) == 2
+
+
+def test_grid_index():
+    g = GridIndex(cell_size=10)
+    g.add(5, 5, "a")
+    g.add(15, 5, "b")
+    g.add(-3, 25, "c")
+    g.add(100, 100, "d")
+
+    assert len(g) == 4
+    assert set(g.query(0, 0, 20, 20)) == {"a", "b"}
+    assert set(g.query(6, 0, 16, 30)) == {"b"}
+    assert set(g.query(-10, 0, 10, 30)) == {"a", "c"}
+    assert set(g.query(200, 200, 300, 300)) == set()